@@ -1,236 +1,305 @@
 import datetime as dt
 import hashlib
+import itertools
+import logging
+import os
+import queue
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from tkinter import END, LEFT, RIGHT, VERTICAL, Y, filedialog, messagebox, simpledialog, ttk
+from tkinter import LEFT, RIGHT, VERTICAL, Y, filedialog, messagebox, simpledialog, ttk
+from typing import TYPE_CHECKING
 import tkinter as tk
 
-from PIL import Image, ImageDraw, ImageTk
-
-
-ROOT = Path(__file__).resolve().parent
-DB_FILE = ROOT / "urban_gear.db"
-IMG_DIR = ROOT / "item_images"
-RES_DIR = ROOT / "resources"
-PLACEHOLDER = RES_DIR / "placeholder.png"
-
-
-def digest(raw: str) -> str:
-    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
-
-
-def db() -> sqlite3.Connection:
-    con = sqlite3.connect(DB_FILE)
-    con.row_factory = sqlite3.Row
-    con.execute("PRAGMA foreign_keys = ON")
-    return con
-
-
-def prepare_placeholder() -> None:
-    RES_DIR.mkdir(exist_ok=True)
-    if PLACEHOLDER.exists():
-        return
-    img = Image.new("RGB", (300, 200), (245, 245, 245))
-    draw = ImageDraw.Draw(img)
-    draw.rectangle((8, 8, 292, 192), outline=(70, 70, 70), width=3)
-    draw.text((95, 90), "URBAN GEAR", fill=(40, 40, 40))
-    img.save(PLACEHOLDER)
-
-
-def setup_database() -> None:
-    IMG_DIR.mkdir(exist_ok=True)
-    prepare_placeholder()
-    con = db()
-    cur = con.cursor()
-
-    cur.executescript(
-        """
-        CREATE TABLE IF NOT EXISTS accounts (
-          account_id INTEGER PRIMARY KEY AUTOINCREMENT,
-          username TEXT NOT NULL UNIQUE,
-          pass_hash TEXT NOT NULL,
-          fio TEXT NOT NULL,
-          role_code TEXT NOT NULL CHECK (role_code IN ('client','manager','admin'))
-        );
-
-        CREATE TABLE IF NOT EXISTS vendors (
-          vendor_id INTEGER PRIMARY KEY AUTOINCREMENT,
-          title TEXT NOT NULL UNIQUE
-        );
-
-        CREATE TABLE IF NOT EXISTS makers (
-          maker_id INTEGER PRIMARY KEY AUTOINCREMENT,
-          title TEXT NOT NULL UNIQUE
-        );
-
-        CREATE TABLE IF NOT EXISTS groups (
-          group_id INTEGER PRIMARY KEY AUTOINCREMENT,
-          title TEXT NOT NULL UNIQUE
-        );
-
-        CREATE TABLE IF NOT EXISTS measures (
-          measure_id INTEGER PRIMARY KEY AUTOINCREMENT,
-          title TEXT NOT NULL UNIQUE
-        );
-
-        CREATE TABLE IF NOT EXISTS stock_items (
-          item_id INTEGER PRIMARY KEY AUTOINCREMENT,
-          sku TEXT NOT NULL UNIQUE,
-          item_name TEXT NOT NULL,
-          group_id INTEGER NOT NULL,
-          about TEXT NOT NULL DEFAULT '',
-          maker_id INTEGER NOT NULL,
-          vendor_id INTEGER NOT NULL,
-          base_price REAL NOT NULL CHECK(base_price >= 0),
-          measure_id INTEGER NOT NULL,
-          qty INTEGER NOT NULL CHECK(qty >= 0),
-          promo REAL NOT NULL DEFAULT 0 CHECK(promo >= 0 AND promo <= 100),
-          photo_path TEXT,
-          FOREIGN KEY(group_id) REFERENCES groups(group_id),
-          FOREIGN KEY(maker_id) REFERENCES makers(maker_id),
-          FOREIGN KEY(vendor_id) REFERENCES vendors(vendor_id),
-          FOREIGN KEY(measure_id) REFERENCES measures(measure_id)
-        );
-
-        CREATE TABLE IF NOT EXISTS order_states (
-          state_id INTEGER PRIMARY KEY AUTOINCREMENT,
-          title TEXT NOT NULL UNIQUE
-        );
-
-        CREATE TABLE IF NOT EXISTS pickup_locations (
-          location_id INTEGER PRIMARY KEY AUTOINCREMENT,
-          address TEXT NOT NULL UNIQUE
-        );
-
-        CREATE TABLE IF NOT EXISTS sales_orders (
-          order_id INTEGER PRIMARY KEY AUTOINCREMENT,
-          order_code TEXT NOT NULL UNIQUE,
-          customer_name TEXT NOT NULL,
-          state_id INTEGER NOT NULL,
-          location_id INTEGER NOT NULL,
-          created_on TEXT NOT NULL,
-          issued_on TEXT NOT NULL,
-          FOREIGN KEY(state_id) REFERENCES order_states(state_id),
-          FOREIGN KEY(location_id) REFERENCES pickup_locations(location_id)
-        );
-
-        CREATE TABLE IF NOT EXISTS sales_order_rows (
-          row_id INTEGER PRIMARY KEY AUTOINCREMENT,
-          order_id INTEGER NOT NULL,
-          item_id INTEGER NOT NULL,
-          qty INTEGER NOT NULL CHECK(qty > 0),
-          unit_price REAL NOT NULL CHECK(unit_price >= 0),
-          FOREIGN KEY(order_id) REFERENCES sales_orders(order_id) ON DELETE CASCADE,
-          FOREIGN KEY(item_id) REFERENCES stock_items(item_id)
-        );
-        """
-    )
-
-    cur.executemany(
-        "INSERT OR IGNORE INTO accounts(username, pass_hash, fio, role_code) VALUES (?, ?, ?, ?)",
-        [
-            ("root", digest("root123"), "Орлова Мария Николаевна", "admin"),
-            ("boss", digest("boss123"), "Романов Денис Игоревич", "manager"),
-            ("buyer", digest("buyer123"), "Кузнецова Ирина Павловна", "client"),
-        ],
-    )
-
-    for table, col, values in [
-        ("vendors", "title", ["Север Логистик", "Prime Supply", "City Stock"]),
-        ("makers", "title", ["Urban", "Altitude", "Core"]),
-        ("groups", "title", ["Куртки", "Рюкзаки", "Кроссовки"]),
-        ("measures", "title", ["шт."]),
-        ("order_states", "title", ["Новый", "Собирается", "Выдан"]),
-        (
-            "pickup_locations",
-            "address",
-            ["г. Москва, ул. Ленина, 10", "г. Казань, ул. Баумана, 5"],
-        ),
-    ]:
-        cur.executemany(
-            f"INSERT OR IGNORE INTO {table}({col}) VALUES (?)",
-            [(v,) for v in values],
-        )
-
-    cur.executemany(
-        """
-        INSERT OR IGNORE INTO stock_items(sku, item_name, group_id, about, maker_id, vendor_id, base_price, measure_id, qty, promo, photo_path)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        [
-            ("UG-A101", "Куртка Storm", 1, "Ветрозащитная куртка", 1, 1, 7990, 1, 5, 10, str(PLACEHOLDER)),
-            ("UG-A115", "Куртка Polar", 1, "Зимняя куртка", 2, 1, 9990, 1, 3, 7, str(PLACEHOLDER)),
-            ("UG-A140", "Куртка City", 1, "Легкая городская куртка", 3, 2, 6490, 1, 12, 0, str(PLACEHOLDER)),
-            ("UG-B210", "Рюкзак Metro", 2, "Городской рюкзак 20л", 2, 2, 3990, 1, 0, 18, str(PLACEHOLDER)),
-            ("UG-B240", "Рюкзак Trail", 2, "Треккинговый рюкзак 35л", 1, 3, 6590, 1, 6, 12, str(PLACEHOLDER)),
-            ("UG-B290", "Сумка Sling", 2, "Компактная сумка через плечо", 3, 1, 2790, 1, 14, 0, str(PLACEHOLDER)),
-            ("UG-C330", "Кроссовки Dash", 3, "Повседневные кроссовки", 3, 3, 5990, 1, 8, 5, str(PLACEHOLDER)),
-            ("UG-C350", "Кроссовки Sprint", 3, "Беговая модель", 2, 2, 7290, 1, 4, 16, str(PLACEHOLDER)),
-            ("UG-C390", "Кеды Street", 3, "Классические кеды", 1, 1, 4890, 1, 9, 0, str(PLACEHOLDER)),
-            ("UG-C420", "Кроссовки Aero", 3, "Легкие кроссовки", 2, 3, 8190, 1, 2, 20, str(PLACEHOLDER)),
-        ],
-    )
-
-    count_orders = cur.execute("SELECT COUNT(*) c FROM sales_orders").fetchone()["c"]
-    if count_orders == 0:
-        state_map = {
-            row["title"]: row["state_id"]
-            for row in cur.execute("SELECT state_id, title FROM order_states").fetchall()
-        }
-        location_map = {
-            row["address"]: row["location_id"]
-            for row in cur.execute("SELECT location_id, address FROM pickup_locations").fetchall()
-        }
-
-        cur.executemany(
-            """
-            INSERT INTO sales_orders(order_code, customer_name, state_id, location_id, created_on, issued_on)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """,
-            [
-                ("SO-2026-001", "Климова Елена", state_map["Новый"], location_map["г. Москва, ул. Ленина, 10"], "2026-02-20", "2026-02-23"),
-                ("SO-2026-002", "Астахов Иван", state_map["Собирается"], location_map["г. Казань, ул. Баумана, 5"], "2026-02-21", "2026-02-24"),
-                ("SO-2026-003", "Воробьева Марина", state_map["Выдан"], location_map["г. Москва, ул. Ленина, 10"], "2026-02-18", "2026-02-22"),
-            ],
-        )
-
-        item_map = {
-            row["sku"]: row["item_id"]
-            for row in cur.execute("SELECT item_id, sku FROM stock_items").fetchall()
-        }
-        order_map = {
-            row["order_code"]: row["order_id"]
-            for row in cur.execute("SELECT order_id, order_code FROM sales_orders").fetchall()
-        }
-
-        cur.executemany(
-            """
-            INSERT INTO sales_order_rows(order_id, item_id, qty, unit_price)
-            VALUES (?, ?, ?, ?)
-            """,
-            [
-                (order_map["SO-2026-001"], item_map["UG-A101"], 1, 7990),
-                (order_map["SO-2026-001"], item_map["UG-B240"], 1, 6590),
-                (order_map["SO-2026-002"], item_map["UG-C350"], 2, 7290),
-                (order_map["SO-2026-002"], item_map["UG-B290"], 1, 2790),
-                (order_map["SO-2026-003"], item_map["UG-C390"], 1, 4890),
-            ],
-        )
+import store
+from store import PLACEHOLDER, PREVIEW_SIZE, ROOT, THUMB_SIZE, KeysetPager
+
+if TYPE_CHECKING:
+    from PIL import Image, ImageTk
+
+
+log = logging.getLogger(__name__)
+
+THUMB_DIR = ROOT / "thumb_cache"
+THUMB_BUDGET = 32 * 1024 * 1024
+WORKER_POLL_MS = 15
+CHANGE_POLL_MS = 1000
+SEARCH_DELAY_MS = 250
+FILTER_DELAY_MS = 10
+PREFETCH_ROWS = 20
+CATALOG_ROW_HEIGHT = 58
+TREE_HEADER_HEIGHT = 26
+CATALOG_SORTS = {
+    "Без сортировки": "",
+    "Остаток ↑": "qty",
+    "Остаток ↓": "-qty",
+    "Цена ↑": "price",
+    "Цена ↓": "-price",
+    "Скидка ↑": "promo",
+    "Скидка ↓": "-promo",
+    "Название А–Я": "name",
+    "Название Я–А": "-name",
+}
+CATALOG_HEADING_SORTS = {
+    "item_id": "id",
+    "sku": "sku",
+    "item_name": "name",
+    "group": "group",
+    "about": "about",
+    "maker": "maker",
+    "vendor": "vendor",
+    "price": "base_price",
+    "final": "price",
+    "qty": "qty",
+    "promo": "promo",
+}
+SALES_DIMENSIONS = {"Товар": "item", "Поставщик": "vendor", "Категория": "group", "Пункт выдачи": "location", "День": "day", "Месяц": "month"}
+
+
+class TreeSync:
+    def __init__(self, tree: ttk.Treeview) -> None:
+        self.tree = tree
+        self.rows: dict[str, dict] = {}
+        self.order: list[str] = []
+
+    def apply(self, rows: list[tuple[str, dict]]) -> int:
+        wanted = {iid for iid, _ in rows}
+        gone = [iid for iid in self.order if iid not in wanted]
+        if gone:
+            self.tree.delete(*gone)
+        current = [iid for iid in self.order if iid in wanted]
+        changes, pos, placed = len(gone), 0, set()
+        for idx, (iid, opts) in enumerate(rows):
+            old = self.rows.get(iid)
+            if old is None:
+                self.tree.insert("", idx, iid=iid, **opts)
+                changes += 1
+            else:
+                while pos < len(current) and current[pos] in placed:
+                    pos += 1
+                if pos < len(current) and current[pos] == iid:
+                    pos += 1
+                else:
+                    self.tree.move(iid, "", idx)
+                    changes += 1
+                if old != opts:
+                    self.tree.item(iid, **opts)
+                    changes += 1
+            placed.add(iid)
+        self.rows = dict(rows)
+        self.order = [iid for iid, _ in rows]
+        return changes
+
+
+class Debouncer:
+    def __init__(self, widget: tk.Misc, callback) -> None:
+        self.widget = widget
+        self.callback = callback
+        self.pending = None
+
+    def __call__(self, delay_ms: int = SEARCH_DELAY_MS) -> None:
+        self.cancel()
+        self.pending = self.widget.after(delay_ms, self.fire)
+
+    def fire(self) -> None:
+        self.pending = None
+        self.callback()
+
+    def cancel(self) -> None:
+        if self.pending is not None:
+            self.widget.after_cancel(self.pending)
+            self.pending = None
+
+
+class ThumbnailCache:
+    def __init__(self, cache_dir: Path, budget: int = THUMB_BUDGET) -> None:
+        self.cache_dir = cache_dir
+        self.budget = budget
+        self.used = 0
+        self.photos: OrderedDict[tuple, "ImageTk.PhotoImage"] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def source(self, path: str | None) -> tuple[Path, os.stat_result]:
+        src = Path(path or str(PLACEHOLDER))
+        try:
+            return src, src.stat()
+        except OSError:
+            store.prepare_placeholder()
+            return PLACEHOLDER, PLACEHOLDER.stat()
+
+    def disk_path(self, src: Path, stat: os.stat_result, size: tuple[int, int]) -> Path:
+        raw = f"{src.resolve()}|{stat.st_mtime_ns}|{stat.st_size}|{size[0]}x{size[1]}"
+        return self.cache_dir / f"{hashlib.sha1(raw.encode('utf-8')).hexdigest()}.png"
+
+    def image(self, path: str | None, size: tuple[int, int] = THUMB_SIZE) -> "Image.Image":
+        from PIL import Image
+
+        src, stat = self.source(path)
+        cached = self.disk_path(src, stat, size)
+        if cached.exists():
+            with Image.open(cached) as img:
+                img.load()
+            return img
+        with Image.open(src) as raw:
+            if raw.size == size:
+                return raw.convert("RGB")
+            img = raw.convert("RGB").resize(size)
+        self.cache_dir.mkdir(exist_ok=True)
+        tmp = cached.with_suffix(f".{threading.get_ident()}.tmp")
+        img.save(tmp, "PNG")
+        os.replace(tmp, cached)
+        return img
+
+    def key(self, path: str | None, size: tuple[int, int]) -> tuple:
+        src, stat = self.source(path)
+        return (str(src), stat.st_mtime_ns, stat.st_size, size)
+
+    def lookup(self, path: str | None, size: tuple[int, int] = THUMB_SIZE) -> "ImageTk.PhotoImage | None":
+        key = self.key(path, size)
+        photo = self.photos.get(key)
+        if photo is not None:
+            self.hits += 1
+            self.photos.move_to_end(key)
+        return photo
+
+    def photo(self, path: str | None, size: tuple[int, int] = THUMB_SIZE) -> "ImageTk.PhotoImage":
+        photo = self.lookup(path, size)
+        if photo is None:
+            photo = self.put(path, self.image(path, size), size)
+        return photo
+
+    def put(self, path: str | None, image: "Image.Image", size: tuple[int, int] = THUMB_SIZE) -> "ImageTk.PhotoImage":
+        from PIL import ImageTk
+
+        key = self.key(path, size)
+        if key in self.photos:
+            return self.photos[key]
+        self.misses += 1
+        photo = ImageTk.PhotoImage(image)
+        self.photos[key] = photo
+        self.used += size[0] * size[1] * 4
+        while self.used > self.budget and len(self.photos) > 1:
+            (_, _, _, old_size), _ = self.photos.popitem(last=False)
+            self.used -= old_size[0] * old_size[1] * 4
+        return photo
+
+    def clear(self) -> None:
+        self.photos.clear()
+        self.used = 0
+
+
+thumbnails = ThumbnailCache(THUMB_DIR)
+
+
+class BackgroundWorker:
+    def __init__(self, db_threads: int = 2, image_threads: int = min(4, os.cpu_count() or 1)) -> None:
+        self.db = ThreadPoolExecutor(max_workers=db_threads, thread_name_prefix="ug-db")
+        self.images = ThreadPoolExecutor(max_workers=image_threads, thread_name_prefix="ug-img")
+        self.done: queue.SimpleQueue = queue.SimpleQueue()
+        self.tokens: dict[tuple[str, str], int] = {}
+        self.counter = itertools.count(1)
+        self.root = None
+        self.timing = None
+
+    def attach(self, root: tk.Misc) -> None:
+        self.root = root
+        self.poll()
+
+    def poll(self) -> None:
+        while True:
+            try:
+                owner, channel, token, future, callback, error = self.done.get_nowait()
+            except queue.Empty:
+                break
+            key = (str(owner), channel)
+            if self.tokens.get(key) != token:
+                continue
+            del self.tokens[key]
+            if not owner.winfo_exists():
+                continue
+            try:
+                kind, elapsed, result = future.result()
+            except Exception as ex:
+                if error is None:
+                    messagebox.showerror("Ошибка", str(ex), parent=owner)
+                else:
+                    error(ex)
+                continue
+            if self.timing is not None:
+                self.timing(kind, elapsed)
+            callback(result)
+        self.root.after(WORKER_POLL_MS, self.poll)
+
+    def submit(self, pool: ThreadPoolExecutor, owner: tk.Misc, channel: str, callback, fn, *args, error=None) -> int:
+        key = (str(owner), channel)
+        token = self.tokens[key] = next(self.counter)
+
+        def run():
+            started = time.perf_counter()
+            if pool is not self.db:
+                result = fn(*args)
+                return "images", (time.perf_counter() - started) * 1000, result
+            con = store.connections.read()
+            con.set_progress_handler(lambda: self.tokens.get(key) != token, 1000)
+            try:
+                with store.tracer.scope(f"{type(owner).__name__}:{channel}"):
+                    result = fn(*args)
+                return "query", (time.perf_counter() - started) * 1000, result
+            finally:
+                con.set_progress_handler(None, 0)
+
+        future = pool.submit(run)
+        future.add_done_callback(lambda f: self.done.put((owner, channel, token, f, callback, error)))
+        return token
+
+    def read(self, owner: tk.Misc, channel: str, callback, fn, *args) -> int:
+        return self.submit(self.db, owner, channel, callback, fn, *args)
+
+    def decode(self, owner: tk.Misc, channel: str, callback, fn, *args, error=None) -> int:
+        return self.submit(self.images, owner, channel, callback, fn, *args, error=error)
+
+    def shutdown(self) -> None:
+        self.tokens.clear()
+        self.db.shutdown(wait=False, cancel_futures=True)
+        self.images.shutdown(wait=False, cancel_futures=True)
+
+
+worker = BackgroundWorker()
+
+
+class PerfOverlay:
+    def __init__(self, root: tk.Tk) -> None:
+        self.label = tk.Label(root, bg="#202020", fg="#9cff9c", font=("Consolas", 9), padx=6, pady=2)
+        self.values = {"query": 0.0, "images": 0.0, "render": 0.0}
+        self.visible = False
+
+    def toggle(self, _event: tk.Event | None = None) -> None:
+        self.visible = not self.visible
+        if self.visible:
+            self.label.place(relx=1.0, rely=1.0, anchor="se")
+            self.show()
+        else:
+            self.label.place_forget()
 
-    con.commit()
-    con.close()
+    def reset(self) -> None:
+        self.values = dict.fromkeys(self.values, 0.0)
+        self.show()
 
+    def add(self, kind: str, elapsed_ms: float) -> None:
+        self.values[kind] += elapsed_ms
+        self.show()
 
-def save_item_image(path: str, old: str | None = None) -> str:
-    IMG_DIR.mkdir(exist_ok=True)
-    img = Image.open(path).convert("RGB").resize((300, 200))
-    out = IMG_DIR / f"item_{dt.datetime.now().strftime('%Y%m%d%H%M%S%f')}.png"
-    img.save(out, "PNG")
-    if old:
-        old_path = Path(old)
-        if old_path.exists() and old_path.parent == IMG_DIR:
-            old_path.unlink(missing_ok=True)
-    return str(out)
+    def show(self) -> None:
+        if not self.visible:
+            return
+        self.label.configure(
+            text=f"SQL {self.values['query']:.1f} мс | изображения {self.values['images']:.1f} мс | отрисовка {self.values['render']:.1f} мс"
+        )
+        self.label.lift()
 
 
 class UrbanGearApp(tk.Tk):
@@ -239,9 +308,16 @@ class UrbanGearApp(tk.Tk):
         self.title("ООО Обувь")
         self.geometry("1240x760")
         self.setup_styles()
+        self.overlay = PerfOverlay(self)
+        self.bind_all("<F12>", self.overlay.toggle)
+        if store.tracer.enabled:
+            self.overlay.toggle()
+        worker.timing = self.overlay.add
+        worker.attach(self)
         self.current_user = None
         self.active = None
         self.open_login()
+        self.after(CHANGE_POLL_MS, self.poll_changes)
 
     def setup_styles(self) -> None:
         style = ttk.Style(self)
@@ -250,7 +326,7 @@ class UrbanGearApp(tk.Tk):
         except tk.TclError:
             pass
 
-        style.configure("UG.Treeview", rowheight=58, font=("Segoe UI", 9), background="#ffffff", fieldbackground="#ffffff")
+        style.configure("UG.Treeview", rowheight=CATALOG_ROW_HEIGHT, font=("Segoe UI", 9), background="#ffffff", fieldbackground="#ffffff")
         style.configure("UG.Treeview.Heading", background="#2E8B57", foreground="white", font=("Segoe UI", 9, "bold"))
         style.map("UG.Treeview.Heading", background=[("active", "#72f700")], foreground=[("active", "black")])
 
@@ -262,11 +338,21 @@ class UrbanGearApp(tk.Tk):
         style.configure("UGR.Treeview.Heading", background="#2E8B57", foreground="white", font=("Segoe UI", 9, "bold"))
         style.map("UGR.Treeview.Heading", background=[("active", "#72f700")], foreground=[("active", "black")])
 
+    def poll_changes(self) -> None:
+        self.after(CHANGE_POLL_MS, self.poll_changes)
+        changes = store.changes.poll()
+        if changes is None or changes.get("stock_items"):
+            store.item_search.invalidate()
+        handler = getattr(self.active, "apply_changes", None)
+        if handler is not None and changes != {}:
+            handler(changes)
+
     def set_screen(self, frame: tk.Frame) -> None:
         if self.active is not None:
             self.active.destroy()
         self.active = frame
         self.active.pack(fill="both", expand=True)
+        self.overlay.show()
 
     def open_login(self) -> None:
         self.current_user = None
@@ -280,6 +366,10 @@ class UrbanGearApp(tk.Tk):
         self.current_user = user
         self.set_screen(OrdersScreen(self, user))
 
+    def open_analytics(self, user: dict) -> None:
+        self.current_user = user
+        self.set_screen(AnalyticsScreen(self, user))
+
 
 class LoginScreen(tk.Frame):
     def __init__(self, app: UrbanGearApp) -> None:
@@ -305,7 +395,7 @@ class LoginScreen(tk.Frame):
         tk.Button(btns, text="Инициализировать БД", width=32, bg="#72f700", command=self.init_db_click).pack(pady=4)
 
     def init_db_click(self) -> None:
-        setup_database()
+        store.seed_database()
         messagebox.showinfo("Готово", "База данных инициализирована")
 
     def as_guest(self) -> None:
@@ -317,12 +407,7 @@ class LoginScreen(tk.Frame):
         if not username or not password:
             messagebox.showerror("Ошибка", "Введите логин и пароль")
             return
-        con = db()
-        user = con.execute(
-            "SELECT account_id, fio, role_code FROM accounts WHERE username=? AND pass_hash=?",
-            (username, digest(password)),
-        ).fetchone()
-        con.close()
+        user = store.authenticate(username, password)
         if not user:
             messagebox.showerror("Ошибка", "Неверные учетные данные")
             return
@@ -337,15 +422,32 @@ class CatalogScreen(tk.Frame):
         self.search = tk.StringVar()
         self.sort = tk.StringVar(value="Без сортировки")
         self.vendor = tk.StringVar(value="Все поставщики")
+        self.price_from = tk.StringVar()
+        self.price_to = tk.StringVar()
         self.vendor_map = {"Все поставщики": None}
+        self.sorts = dict(CATALOG_SORTS)
+        self.headings = {}
         self.images = []
         self.edit_open = False
+        self.pager = None
+        self.query = None
+        self.snapshot = None
+        self.snapshot_pending = set()
+        self.total = 0
+        self.first = 0
+        self.visible = 1
+        self.selected_item = None
+        self.render_job = None
+        self.pending_thumbs = set()
+        self.failed_thumbs = set()
+        self.schedule = Debouncer(self, self.apply_filters)
 
         self.build_header()
         self.build_filters()
         self.build_table()
         self.load_vendors()
         self.refresh()
+        self.load_snapshot()
 
     def build_header(self) -> None:
         top = tk.Frame(self, bg="#f8fbf3")
@@ -378,14 +480,20 @@ class CatalogScreen(tk.Frame):
                 textvariable=self.sort,
                 state="readonly",
                 width=18,
-                values=["Без сортировки", "Остаток ↑", "Остаток ↓"],
+                values=list(CATALOG_SORTS),
             ).pack(side=LEFT, padx=6)
             tk.Label(left_controls, text="Поставщик:").pack(side=LEFT, padx=(12, 4))
             self.vendor_combo = ttk.Combobox(left_controls, textvariable=self.vendor, state="readonly", width=22)
             self.vendor_combo.pack(side=LEFT, padx=6)
-            self.search.trace_add("write", lambda *_: self.refresh())
-            self.sort.trace_add("write", lambda *_: self.refresh())
-            self.vendor.trace_add("write", lambda *_: self.refresh())
+            tk.Label(left_controls, text="Цена от:").pack(side=LEFT, padx=(12, 4))
+            tk.Entry(left_controls, textvariable=self.price_from, width=8).pack(side=LEFT, padx=4)
+            tk.Label(left_controls, text="до:").pack(side=LEFT, padx=(4, 4))
+            tk.Entry(left_controls, textvariable=self.price_to, width=8).pack(side=LEFT, padx=4)
+            self.search.trace_add("write", lambda *_: self.schedule(SEARCH_DELAY_MS))
+            self.price_from.trace_add("write", lambda *_: self.schedule(SEARCH_DELAY_MS))
+            self.price_to.trace_add("write", lambda *_: self.schedule(SEARCH_DELAY_MS))
+            self.sort.trace_add("write", lambda *_: self.schedule(FILTER_DELAY_MS))
+            self.vendor.trace_add("write", lambda *_: self.schedule(FILTER_DELAY_MS))
 
         right_actions = tk.Frame(row)
         right_actions.pack(side=RIGHT, padx=(10, 6), pady=4)
@@ -421,7 +529,8 @@ class CatalogScreen(tk.Frame):
             ("qty", "Остаток на складе", 120),
             ("promo", "Скидка, %", 85),
         ]:
-            self.table.heading(col, text=title, anchor="center")
+            self.headings[col] = title
+            self.table.heading(col, text=title, anchor="center", command=lambda c=col: self.sort_by(c))
             self.table.column(col, width=width, anchor="w")
 
         self.table.heading("#0", text="Изображение", anchor="center")
@@ -430,78 +539,265 @@ class CatalogScreen(tk.Frame):
         self.table.tag_configure("odd", background="#f5f5f5")
         self.table.tag_configure("even", background="#ffffff")
         self.table.pack(side=LEFT, fill="both", expand=True)
-        ttk.Scrollbar(wrap, orient=VERTICAL, command=self.table.yview).pack(side=RIGHT, fill=Y)
-        self.table.configure(yscrollcommand=lambda f, l: None)
+        self.sync = TreeSync(self.table)
+        self.scrollbar = ttk.Scrollbar(wrap, orient=VERTICAL, command=self.on_scroll)
+        self.scrollbar.pack(side=RIGHT, fill=Y)
+        self.table.bind("<Configure>", self.on_resize)
+        self.table.bind("<MouseWheel>", lambda e: self.scroll_to(self.first - 3 * (1 if e.delta > 0 else -1)))
+        self.table.bind("<Button-4>", lambda e: self.scroll_to(self.first - 3))
+        self.table.bind("<Button-5>", lambda e: self.scroll_to(self.first + 3))
+        self.table.bind("<Prior>", lambda e: self.scroll_to(self.first - self.visible))
+        self.table.bind("<Next>", lambda e: self.scroll_to(self.first + self.visible))
+        self.table.bind("<Up>", lambda e: self.step(-1))
+        self.table.bind("<Down>", lambda e: self.step(1))
+        self.table.bind("<<TreeviewSelect>>", self.on_select)
 
     def load_vendors(self) -> None:
         if self.user["role_code"] not in ("manager", "admin"):
             return
-        con = db()
-        rows = con.execute("SELECT vendor_id, title FROM vendors ORDER BY title").fetchall()
-        con.close()
-        self.vendor_map = {"Все поставщики": None}
-        for row in rows:
-            self.vendor_map[row["title"]] = row["vendor_id"]
+        self.vendor_map = {"Все поставщики": None, **store.list_vendors()}
         self.vendor_combo["values"] = list(self.vendor_map.keys())
 
-    def refresh(self) -> None:
-        role = self.user["role_code"]
-        con = db()
-        query = (
-            "SELECT si.item_id, si.sku, si.item_name, g.title group_title, si.about, mk.title maker_title, vd.title vendor_title, "
-            "si.base_price, si.promo, ROUND(si.base_price*(1-si.promo/100.0),2) final_price, si.qty, si.photo_path "
-            "FROM stock_items si "
-            "JOIN groups g ON g.group_id=si.group_id "
-            "JOIN makers mk ON mk.maker_id=si.maker_id "
-            "JOIN vendors vd ON vd.vendor_id=si.vendor_id"
+    def destroy(self) -> None:
+        self.schedule.cancel()
+        if self.render_job is not None:
+            self.after_cancel(self.render_job)
+        super().destroy()
+
+    def current_query(self) -> store.CatalogQuery:
+        sort = self.sorts.get(self.sort.get(), "")
+        if self.user["role_code"] not in ("manager", "admin"):
+            return store.CatalogQuery(sort=sort)
+        return store.CatalogQuery(
+            self.search.get().strip(),
+            self.vendor_map.get(self.vendor.get()),
+            sort,
+            self.price_from.get().strip(),
+            self.price_to.get().strip(),
         )
-        where, params = [], []
-        if role in ("manager", "admin"):
-            text = self.search.get().strip().lower()
-            vend = self.vendor_map.get(self.vendor.get())
-            if text:
-                where.append("(lower(si.sku) LIKE ? OR lower(si.item_name) LIKE ? OR lower(g.title) LIKE ? OR lower(si.about) LIKE ? OR lower(mk.title) LIKE ? OR lower(vd.title) LIKE ?)")
-                params.extend([f"%{text}%"] * 6)
-            if vend:
-                where.append("si.vendor_id = ?")
-                params.append(vend)
-        if where:
-            query += " WHERE " + " AND ".join(where)
-        if role in ("manager", "admin") and self.sort.get() == "Остаток ↑":
-            query += " ORDER BY si.qty ASC"
-        elif role in ("manager", "admin") and self.sort.get() == "Остаток ↓":
-            query += " ORDER BY si.qty DESC"
+
+    def apply_filters(self) -> None:
+        if self.current_query() != self.query:
+            self.first = 0
+            self.refresh()
+
+    def sort_by(self, col: str) -> None:
+        code = CATALOG_HEADING_SORTS[col]
+        if self.sorts.get(self.sort.get()) == code:
+            code = f"-{code}"
+        label = next((label for label, value in self.sorts.items() if value == code), None)
+        if label is None:
+            label = f"{self.headings[col]} {'↓' if code.startswith('-') else '↑'}"
+            self.sorts[label] = code
+        self.sort.set(label)
+        if self.user["role_code"] not in ("manager", "admin"):
+            self.apply_filters()
+
+    def refresh(self) -> None:
+        self.schedule.cancel()
+        self.query = query = self.current_query()
+        for col, code in CATALOG_HEADING_SORTS.items():
+            mark = " ↑" if query.sort == code else " ↓" if query.sort == f"-{code}" else ""
+            self.table.heading(col, text=self.headings[col] + mark)
+        self.app.overlay.reset()
+        if self.snapshot is None:
+            self.pager = store.catalog_pager(query)
+            worker.read(self, "catalog", self.on_loaded, self.load_window, self.pager, query, self.first, self.visible)
+        elif query.search:
+            worker.read(self, "catalog", lambda matches: self.show_view(query, matches), store.catalog_matches, query.search)
         else:
-            query += " ORDER BY si.item_id"
-        rows = con.execute(query, params).fetchall()
-        con.close()
+            self.show_view(query)
+
+    def show_view(self, query: store.CatalogQuery, matches: list[int] | None = None) -> None:
+        if query != self.query:
+            return
+        view = self.snapshot.view(query, matches)
+        self.pager = view
+        self.on_loaded((view, view.counts()))
 
-        total_count = len(rows)
-        low_count = len([r for r in rows if r["qty"] == 0])
-        promo_count = len([r for r in rows if r["promo"] > 15])
-        self.info_lbl.configure(text=f"Позиций: {total_count} | Нет в наличии: {low_count} | Скидка >15%: {promo_count}")
+    def load_snapshot(self) -> None:
+        self.snapshot_pending.clear()
+        worker.read(self, "snapshot", self.on_snapshot, store.CatalogSnapshot.load)
+
+    def on_snapshot(self, snapshot: store.CatalogSnapshot) -> None:
+        self.snapshot = snapshot
+        self.refresh()
+        self.sync_snapshot()
+
+    def sync_snapshot(self) -> None:
+        if len(self.snapshot_pending) > store.SNAPSHOT_PATCH_LIMIT:
+            self.load_snapshot()
+        elif self.snapshot_pending:
+            ids = set(self.snapshot_pending)
+            worker.read(self, "changes", lambda fresh: self.on_synced(ids, fresh), store.CatalogSnapshot.fetch, ids)
+
+    def on_synced(self, ids: set[int], fresh: dict[int, tuple]) -> None:
+        self.snapshot.apply(ids, fresh)
+        self.snapshot_pending -= ids
+        self.refresh()
+
+    @staticmethod
+    def load_window(pager: KeysetPager, query: store.CatalogQuery, first: int, visible: int) -> tuple[KeysetPager, store.CatalogCounts]:
+        counts = store.catalog_counts(query)
+        first = max(0, min(first, counts.total - visible))
+        pager.rows(first - PREFETCH_ROWS, first + visible + PREFETCH_ROWS)
+        return pager, counts
+
+    def on_loaded(self, result: tuple[KeysetPager | store.CatalogView, store.CatalogCounts]) -> None:
+        pager, counts = result
+        if pager is not self.pager:
+            return
+        self.total = counts.total
+        self.info_lbl.configure(text=f"Позиций: {counts.total} | Нет в наличии: {counts.zero} | Скидка >{store.HIGH_PROMO}%: {counts.high}")
+        self.render()
+
+    def apply_changes(self, changes: dict[str, set[int]] | None) -> None:
+        if changes is None:
+            self.refresh()
+            self.load_snapshot()
+            return
+        ids = changes.get("stock_items")
+        if not ids:
+            return
+        self.snapshot_pending |= ids
+        if self.snapshot is not None:
+            self.sync_snapshot()
+        elif self.pager is not None:
+            worker.read(self, "changes", self.on_patched, self.patch_window, self.pager, self.query, ids)
+
+    @staticmethod
+    def patch_window(pager: KeysetPager, query: store.CatalogQuery, ids: set[int]) -> tuple[KeysetPager, store.CatalogCounts | None]:
+        if not pager.patch("si.item_id", ids):
+            return pager, None
+        return pager, store.catalog_counts(query)
+
+    def on_patched(self, result: tuple[KeysetPager, store.CatalogCounts | None]) -> None:
+        pager, counts = result
+        if pager is not self.pager:
+            return
+        if counts is None:
+            self.refresh()
+        else:
+            self.on_loaded((pager, counts))
+
+    @staticmethod
+    def fetch_rows(pager: KeysetPager, start: int, stop: int) -> KeysetPager:
+        pager.rows(start, stop)
+        return pager
+
+    def on_paged(self, pager: KeysetPager) -> None:
+        if pager is self.pager:
+            self.render()
+
+    def on_thumb(self, result: tuple[str | None, "Image.Image"]) -> None:
+        path, img = result
+        self.pending_thumbs.discard(path)
+        thumbnails.put(path, img)
+        if self.render_job is None:
+            self.render_job = self.after_idle(self.render)
+
+    def on_thumb_failed(self, path: str | None, ex: Exception) -> None:
+        self.pending_thumbs.discard(path)
+        self.failed_thumbs.add(path)
+        log.warning("Не удалось загрузить миниатюру %s: %s", path, ex)
+
+    def load_thumb(self, path: str | None) -> None:
+        if path in self.pending_thumbs or path in self.failed_thumbs:
+            return
+        self.pending_thumbs.add(path)
+        worker.decode(
+            self, f"thumb:{path}", self.on_thumb, lambda: (path, thumbnails.image(path)), error=lambda ex: self.on_thumb_failed(path, ex)
+        )
+
+    def render(self) -> None:
+        self.render_job = None
+        if self.pager is None:
+            return
+        started = time.perf_counter()
+        self.first = max(0, min(self.first, self.total - self.visible))
+        stop = self.first + self.visible
+        rows = self.pager.rows(self.first, stop, fetch=False)
+        margin = self.pager.rows(self.first - PREFETCH_ROWS, stop + PREFETCH_ROWS, fetch=False)
+        if rows is None or margin is None:
+            worker.read(self, "page", self.on_paged, self.fetch_rows, self.pager, self.first - PREFETCH_ROWS, stop + PREFETCH_ROWS)
+            if rows is None:
+                return
+        for row in margin or []:
+            if thumbnails.lookup(row["thumb_path"] or row["photo_path"]) is None:
+                self.load_thumb(row["thumb_path"] or row["photo_path"])
 
-        self.table.delete(*self.table.get_children())
         self.images = []
-        for idx, row in enumerate(rows):
-            img_path = Path(row["photo_path"] or str(PLACEHOLDER))
-            if not img_path.exists():
-                img_path = PLACEHOLDER
-            thumb = ImageTk.PhotoImage(Image.open(img_path).convert("RGB").resize((46, 46)))
+        items = []
+        for idx, row in enumerate(rows, start=self.first):
+            thumb = thumbnails.lookup(row["thumb_path"] or row["photo_path"])
+            if thumb is None:
+                self.load_thumb(row["thumb_path"] or row["photo_path"])
+                thumb = thumbnails.photo(None)
             self.images.append(thumb)
 
-            tag = "high" if row["promo"] > 15 else "zero" if row["qty"] == 0 else ("even" if idx % 2 == 0 else "odd")
-            self.table.insert(
-                "",
-                END,
-                image=thumb,
-                values=(
-                    row["item_id"], row["sku"], row["item_name"], row["group_title"], row["about"],
-                    row["maker_title"], row["vendor_title"], f"{row['base_price']:.2f}", f"{row['final_price']:.2f}",
-                    row["qty"], f"{int(row['promo'])}%"
-                ),
-                tags=(tag,),
-            )
+            tag = "high" if row["promo"] > store.HIGH_PROMO else "zero" if row["qty"] == 0 else ("even" if idx % 2 == 0 else "odd")
+            items.append((
+                str(row["item_id"]),
+                {
+                    "image": thumb,
+                    "values": (
+                        row["item_id"], row["sku"], row["item_name"], row["group_title"], row["about"],
+                        row["maker_title"], row["vendor_title"], f"{row['base_price']:.2f}", f"{row['final_price']:.2f}",
+                        row["qty"], f"{int(row['promo'])}%"
+                    ),
+                    "tags": (tag,),
+                },
+            ))
+        self.sync.apply(items)
+        if self.selected_item is not None and self.table.exists(str(self.selected_item)):
+            self.table.selection_set(str(self.selected_item))
+        if self.total:
+            self.scrollbar.set(self.first / self.total, min(stop, self.total) / self.total)
+        else:
+            self.scrollbar.set(0, 1)
+        self.app.overlay.add("render", (time.perf_counter() - started) * 1000)
+
+    def scroll_to(self, first: int) -> str:
+        first = max(0, min(first, self.total - self.visible))
+        if first != self.first:
+            self.first = first
+            self.render()
+        return "break"
+
+    def on_scroll(self, action: str, value: str, unit: str | None = None) -> None:
+        if action == "moveto":
+            self.scroll_to(int(float(value) * self.total))
+        elif unit == "pages":
+            self.scroll_to(self.first + int(value) * self.visible)
+        else:
+            self.scroll_to(self.first + int(value))
+
+    def on_resize(self, event: tk.Event) -> None:
+        visible = max(1, (event.height - TREE_HEADER_HEIGHT) // CATALOG_ROW_HEIGHT)
+        if visible != self.visible:
+            self.visible = visible
+            self.render()
+
+    def on_select(self, _event: tk.Event) -> None:
+        item_id = self.selected_id()
+        if item_id is not None:
+            self.selected_item = item_id
+
+    def step(self, delta: int) -> str | None:
+        children = self.table.get_children()
+        focus = self.table.focus()
+        if not children or focus not in children:
+            return None
+        pos = children.index(focus) + delta
+        if 0 <= pos < len(children):
+            return None
+        self.scroll_to(self.first + delta)
+        children = self.table.get_children()
+        if children:
+            edge = children[0] if delta < 0 else children[-1]
+            self.table.focus(edge)
+            self.table.selection_set(edge)
+        return "break"
 
     def selected_id(self) -> int | None:
         sel = self.table.selection()
@@ -514,10 +810,7 @@ class CatalogScreen(tk.Frame):
         if not name:
             return
         try:
-            con = db()
-            con.execute("INSERT INTO vendors(title) VALUES (?)", (name.strip(),))
-            con.commit()
-            con.close()
+            store.add_vendor(name.strip())
             self.load_vendors()
             messagebox.showinfo("Готово", "Поставщик добавлен")
         except sqlite3.IntegrityError:
@@ -546,21 +839,10 @@ class CatalogScreen(tk.Frame):
         if not item_id:
             messagebox.showwarning("Внимание", "Выберите товар")
             return
-        con = db()
-        link = con.execute("SELECT COUNT(*) c FROM sales_order_rows WHERE item_id=?", (item_id,)).fetchone()["c"]
-        if link:
-            con.close()
+        if not store.delete_item(item_id):
             messagebox.showerror("Ошибка", "Нельзя удалить: товар используется в заказах")
             return
-        row = con.execute("SELECT photo_path FROM stock_items WHERE item_id=?", (item_id,)).fetchone()
-        con.execute("DELETE FROM stock_items WHERE item_id=?", (item_id,))
-        con.commit()
-        con.close()
-        if row and row["photo_path"]:
-            path = Path(row["photo_path"])
-            if path.exists() and path.parent == IMG_DIR:
-                path.unlink(missing_ok=True)
-        self.refresh()
+        self.apply_changes({"stock_items": {item_id}})
 
 
 class ItemForm(tk.Toplevel):
@@ -569,6 +851,8 @@ class ItemForm(tk.Toplevel):
         self.parent = parent
         self.item_id = item_id
         self.old_img = None
+        self.old_thumb = None
+        self.row_version = 0
         self.new_img = None
         self.preview = None
         self.maps = {}
@@ -579,8 +863,6 @@ class ItemForm(tk.Toplevel):
         self.fields = {}
         self.build()
         self.load_refs()
-        if item_id:
-            self.load_item(item_id)
 
     def close(self) -> None:
         self.parent.edit_open = False
@@ -631,38 +913,20 @@ class ItemForm(tk.Toplevel):
         tk.Button(btns, text="Отмена", command=self.close).pack(side=LEFT, expand=True, fill="x", padx=2)
 
     def load_refs(self) -> None:
-        con = db()
-        refs = {
-            "group": ("groups", "group_id", "title"),
-            "maker": ("makers", "maker_id", "title"),
-            "vendor": ("vendors", "vendor_id", "title"),
-            "measure": ("measures", "measure_id", "title"),
-        }
-        for key, (table, id_col, val_col) in refs.items():
-            rows = con.execute(f"SELECT {id_col} idv, {val_col} vv FROM {table} ORDER BY vv").fetchall()
-            self.maps[key] = {r["vv"]: r["idv"] for r in rows}
+        self.show_preview(str(PLACEHOLDER))
+        worker.read(self, "refs", self.fill_refs, store.item_refs)
+
+    def fill_refs(self, refs: dict[str, dict[str, int]]) -> None:
+        for key, ids in refs.items():
+            self.maps[key] = ids
             combo: ttk.Combobox = self.fields[key]  # type: ignore
             combo["values"] = list(self.maps[key].keys())
             if combo["values"]:
                 combo.current(0)
-        con.close()
-        self.show_preview(str(PLACEHOLDER))
+        if self.item_id:
+            worker.read(self, "item", self.fill_item, store.load_item, self.item_id)
 
-    def load_item(self, item_id: int) -> None:
-        con = db()
-        row = con.execute(
-            """
-            SELECT si.*, g.title gt, mk.title mt, vd.title vt, ms.title ust
-            FROM stock_items si
-            JOIN groups g ON g.group_id=si.group_id
-            JOIN makers mk ON mk.maker_id=si.maker_id
-            JOIN vendors vd ON vd.vendor_id=si.vendor_id
-            JOIN measures ms ON ms.measure_id=si.measure_id
-            WHERE si.item_id=?
-            """,
-            (item_id,),
-        ).fetchone()
-        con.close()
+    def fill_item(self, row: sqlite3.Row | None) -> None:
         if not row:
             self.close()
             return
@@ -677,6 +941,8 @@ class ItemForm(tk.Toplevel):
         self.fields["vendor"].set(row["vt"])
         self.fields["measure"].set(row["ust"])
         self.old_img = row["photo_path"]
+        self.old_thumb = row["thumb_path"]
+        self.row_version = row["row_version"]
         self.show_preview(row["photo_path"] or str(PLACEHOLDER))
 
     def pick_image(self) -> None:
@@ -687,73 +953,82 @@ class ItemForm(tk.Toplevel):
         self.show_preview(path)
 
     def show_preview(self, path: str) -> None:
-        src = Path(path)
-        if not src.exists():
-            src = PLACEHOLDER
-        photo = ImageTk.PhotoImage(Image.open(src).convert("RGB").resize((300, 200)))
+        photo = thumbnails.lookup(path, PREVIEW_SIZE)
+        if photo is None:
+            worker.decode(self, "preview", lambda img: self.set_preview(thumbnails.put(path, img, PREVIEW_SIZE)), thumbnails.image, path, PREVIEW_SIZE)
+        else:
+            self.set_preview(photo)
+
+    def set_preview(self, photo: "ImageTk.PhotoImage") -> None:
         self.preview = photo
         self.preview_label.configure(image=photo)
 
     def save(self) -> None:
         try:
-            sku = self.fields["sku"].get().strip()
-            name = self.fields["name"].get().strip()
-            about = self.fields["about"].get().strip()
-            group_id = self.maps["group"][self.fields["group"].get().strip()]
-            maker_id = self.maps["maker"][self.fields["maker"].get().strip()]
-            vendor_id = self.maps["vendor"][self.fields["vendor"].get().strip()]
-            measure_id = self.maps["measure"][self.fields["measure"].get().strip()]
-            price = float(self.fields["price"].get().strip().replace(",", "."))
-            qty = int(self.fields["qty"].get().strip())
-            promo = float(self.fields["promo"].get().strip().replace(",", "."))
-
-            if not sku or not name:
-                raise ValueError("SKU и название обязательны")
-            if price < 0 or qty < 0:
-                raise ValueError("Цена и остаток не могут быть отрицательными")
-            if promo < 0 or promo > 100:
-                raise ValueError("Скидка должна быть 0..100")
-
-            path = self.old_img or str(PLACEHOLDER)
+            item = store.ItemData(
+                sku=self.fields["sku"].get().strip(),
+                item_name=self.fields["name"].get().strip(),
+                group_id=self.maps["group"][self.fields["group"].get().strip()],
+                about=self.fields["about"].get().strip(),
+                maker_id=self.maps["maker"][self.fields["maker"].get().strip()],
+                vendor_id=self.maps["vendor"][self.fields["vendor"].get().strip()],
+                base_price=float(self.fields["price"].get().strip().replace(",", ".")),
+                measure_id=self.maps["measure"][self.fields["measure"].get().strip()],
+                qty=int(self.fields["qty"].get().strip()),
+                promo=float(self.fields["promo"].get().strip().replace(",", ".")),
+                photo_path=self.old_img or str(PLACEHOLDER),
+                thumb_path=self.old_thumb,
+                row_version=self.row_version,
+            )
+            item.validate()
             if self.new_img:
-                path = save_item_image(self.new_img, self.old_img)
-
-            con = db()
-            if self.item_id is None:
-                con.execute(
-                    """
-                    INSERT INTO stock_items(sku, item_name, group_id, about, maker_id, vendor_id, base_price, measure_id, qty, promo, photo_path)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (sku, name, group_id, about, maker_id, vendor_id, price, measure_id, qty, promo, path),
-                )
+                worker.decode(self, "ingest", lambda paths: self.write(item, paths), store.ingest_item_image, self.new_img)
             else:
-                con.execute(
-                    """
-                    UPDATE stock_items
-                    SET sku=?, item_name=?, group_id=?, about=?, maker_id=?, vendor_id=?, base_price=?, measure_id=?, qty=?, promo=?, photo_path=?
-                    WHERE item_id=?
-                    """,
-                    (sku, name, group_id, about, maker_id, vendor_id, price, measure_id, qty, promo, path, self.item_id),
-                )
-            con.commit()
-            con.close()
-            self.parent.refresh()
-            self.close()
-        except sqlite3.IntegrityError:
-            messagebox.showerror("Ошибка", "SKU должен быть уникальным")
+                self.write(item)
         except Exception as ex:
             messagebox.showerror("Ошибка", str(ex))
 
+    def write(self, item: store.ItemData, paths: dict[str, str] | None = None) -> None:
+        if paths:
+            item.photo_path, item.thumb_path = paths["photo_path"], paths["thumb_path"]
+        try:
+            item_id = store.save_item(item, self.item_id)
+        except Exception as ex:
+            if paths:
+                store.discard_item_images(item.photo_path, item.thumb_path)
+            messagebox.showerror("Ошибка", "SKU должен быть уникальным" if isinstance(ex, sqlite3.IntegrityError) else str(ex))
+            return
+        if paths:
+            store.discard_item_images(self.old_img, self.old_thumb)
+        self.parent.apply_changes({"stock_items": {item_id}})
+        self.close()
+
 
 class OrdersScreen(tk.Frame):
     def __init__(self, app: UrbanGearApp, user: dict) -> None:
         super().__init__(app, padx=10, pady=10)
         self.app = app
         self.user = user
+        self.state_filter = tk.StringVar(value="Все статусы")
+        self.location_filter = tk.StringVar(value="Все пункты")
+        self.date_field = tk.StringVar(value="Дата заказа")
+        self.date_from = tk.StringVar()
+        self.date_to = tk.StringVar()
+        self.query = tk.StringVar()
+        self.state_map = {"Все статусы": None}
+        self.location_map = {"Все пункты": None}
+        self.pager = None
+        self.rows = []
+        self.next_page = 0
+        self.more = False
+        self.loading = False
+        self.pending = set()
+        self.schedule = Debouncer(self, self.refresh)
         self.build_header()
         self.build_actions()
+        self.build_filters()
         self.build_table()
+        self.load_filters()
         self.refresh()
 
     def build_header(self) -> None:
@@ -761,6 +1036,7 @@ class OrdersScreen(tk.Frame):
         top.pack(fill="x")
         tk.Label(top, text="Управление заказами", font=("Segoe UI", 22, "bold")).pack(side=LEFT)
         tk.Button(top, text="Назад", command=lambda: self.app.open_catalog(self.user)).pack(side=RIGHT)
+        tk.Button(top, text="Аналитика", bg="#28f08c", command=lambda: self.app.open_analytics(self.user)).pack(side=RIGHT, padx=8)
 
     def build_actions(self) -> None:
         row = tk.Frame(self)
@@ -769,43 +1045,147 @@ class OrdersScreen(tk.Frame):
             tk.Button(row, text="Создать заказ", bg="#72f700", command=lambda: OrderForm(self, None)).pack(side=LEFT, padx=4)
             tk.Button(row, text="Изменить", command=self.edit).pack(side=LEFT, padx=4)
             tk.Button(row, text="Удалить", command=self.delete).pack(side=LEFT, padx=4)
+        self.info_lbl = tk.Label(row, text="")
+        self.info_lbl.pack(side=RIGHT, padx=4)
+
+    def build_filters(self) -> None:
+        row = tk.LabelFrame(self, text="Фильтры", padx=8, pady=6)
+        row.pack(fill="x", pady=(0, 8))
+        tk.Label(row, text="Статус:").pack(side=LEFT, padx=(4, 4))
+        self.state_combo = ttk.Combobox(row, textvariable=self.state_filter, state="readonly", width=14)
+        self.state_combo.pack(side=LEFT, padx=4)
+        tk.Label(row, text="Пункт выдачи:").pack(side=LEFT, padx=(10, 4))
+        self.location_combo = ttk.Combobox(row, textvariable=self.location_filter, state="readonly", width=28)
+        self.location_combo.pack(side=LEFT, padx=4)
+        ttk.Combobox(row, textvariable=self.date_field, state="readonly", width=12, values=["Дата заказа", "Дата выдачи"]).pack(side=LEFT, padx=(10, 4))
+        tk.Label(row, text="с").pack(side=LEFT)
+        tk.Entry(row, textvariable=self.date_from, width=11).pack(side=LEFT, padx=4)
+        tk.Label(row, text="по").pack(side=LEFT)
+        tk.Entry(row, textvariable=self.date_to, width=11).pack(side=LEFT, padx=4)
+        tk.Label(row, text="Код / клиент:").pack(side=LEFT, padx=(10, 4))
+        tk.Entry(row, textvariable=self.query, width=18).pack(side=LEFT, padx=4)
+        for var in (self.state_filter, self.location_filter, self.date_field):
+            var.trace_add("write", lambda *_: self.schedule(FILTER_DELAY_MS))
+        for var in (self.date_from, self.date_to, self.query):
+            var.trace_add("write", lambda *_: self.schedule(SEARCH_DELAY_MS))
 
     def build_table(self) -> None:
-        cols = ("id", "code", "customer", "state", "location", "created", "issued", "total")
-        self.table = ttk.Treeview(self, columns=cols, show="headings", style="UGO.Treeview")
+        wrap = tk.Frame(self)
+        wrap.pack(fill="both", expand=True)
+        cols = ("id", "code", "customer", "state", "location", "created", "issued", "count", "total")
+        self.table = ttk.Treeview(wrap, columns=cols, show="headings", style="UGO.Treeview")
         for col, title, width in [
             ("id", "ID", 50), ("code", "Код", 100), ("customer", "Клиент", 160), ("state", "Статус", 110),
-            ("location", "Пункт выдачи", 250), ("created", "Дата", 110), ("issued", "Выдача", 110), ("total", "Итого", 90),
+            ("location", "Пункт выдачи", 250), ("created", "Дата", 110), ("issued", "Выдача", 110), ("count", "Кол-во", 70), ("total", "Итого", 90),
         ]:
             self.table.heading(col, text=title, anchor="center")
             self.table.column(col, width=width)
         self.table.tag_configure("odd", background="#f5f5f5")
         self.table.tag_configure("even", background="#ffffff")
-        self.table.pack(fill="both", expand=True)
+        self.table.pack(side=LEFT, fill="both", expand=True)
+        self.scrollbar = ttk.Scrollbar(wrap, orient=VERTICAL, command=self.table.yview)
+        self.scrollbar.pack(side=RIGHT, fill=Y)
+        self.table.configure(yscrollcommand=self.on_yscroll)
+        self.sync = TreeSync(self.table)
+
+    def destroy(self) -> None:
+        self.schedule.cancel()
+        super().destroy()
+
+    def load_filters(self) -> None:
+        worker.read(self, "filters", self.fill_filters, store.order_refs)
+
+    def fill_filters(self, refs: tuple[dict[str, int], dict[str, int]]) -> None:
+        st, loc = refs
+        self.state_map = {"Все статусы": None, **st}
+        self.location_map = {"Все пункты": None, **loc}
+        self.state_combo["values"] = list(self.state_map.keys())
+        self.location_combo["values"] = list(self.location_map.keys())
+
+    def filters(self) -> store.OrderQuery:
+        return store.OrderQuery(
+            state_id=self.state_map.get(self.state_filter.get()),
+            location_id=self.location_map.get(self.location_filter.get()),
+            date_field="issued_on" if self.date_field.get() == "Дата выдачи" else "created_on",
+            date_from=self.date_from.get().strip(),
+            date_to=self.date_to.get().strip(),
+            text=self.query.get().strip(),
+        )
 
     def refresh(self) -> None:
-        con = db()
-        rows = con.execute(
-            """
-            SELECT so.order_id, so.order_code, so.customer_name, st.title state_title, pl.address,
-                   so.created_on, so.issued_on,
-                   COALESCE(SUM(sr.qty * sr.unit_price), 0) total_sum
-            FROM sales_orders so
-            JOIN order_states st ON st.state_id = so.state_id
-            JOIN pickup_locations pl ON pl.location_id = so.location_id
-            LEFT JOIN sales_order_rows sr ON sr.order_id = so.order_id
-            GROUP BY so.order_id
-            ORDER BY so.order_id DESC
-            """
-        ).fetchall()
-        con.close()
-        self.table.delete(*self.table.get_children())
-        for idx, row in enumerate(rows):
-            self.table.insert(
-                "", END,
-                values=(row["order_id"], row["order_code"], row["customer_name"], row["state_title"], row["address"], row["created_on"], row["issued_on"], f"{row['total_sum']:.2f}"),
-                tags=(("even" if idx % 2 == 0 else "odd"),)
+        self.schedule.cancel()
+        self.pager = store.orders_pager(self.filters())
+        self.app.overlay.reset()
+        self.loading = True
+        pages = max(1, -(-len(self.rows) // self.pager.page_size))
+        worker.read(self, "orders", self.on_loaded, self.fetch_pages, self.pager, 0, pages)
+
+    @staticmethod
+    def fetch_pages(pager: KeysetPager, start: int, count: int) -> tuple[KeysetPager, int, list[sqlite3.Row], int, bool]:
+        rows = []
+        for page in range(start, start + count):
+            chunk = pager.fetch(page)
+            rows.extend(chunk)
+            if len(chunk) < pager.page_size:
+                return pager, start, rows, page + 1, False
+        return pager, start, rows, start + count, True
+
+    def on_loaded(self, result: tuple[KeysetPager, int, list[sqlite3.Row], int, bool]) -> None:
+        pager, start, rows, next_page, more = result
+        if pager is not self.pager:
+            return
+        self.loading = False
+        self.next_page, self.more = next_page, more
+        self.rows = rows if start == 0 else self.rows + rows
+        self.show_rows()
+        if self.pending:
+            ids, self.pending = self.pending, set()
+            self.apply_changes({"sales_orders": ids})
+
+    def apply_changes(self, changes: dict[str, set[int]] | None) -> None:
+        if changes is None:
+            self.refresh()
+            return
+        ids = changes.get("sales_orders", set()) | changes.get("sales_order_rows", set())
+        if not ids or self.pager is None:
+            return
+        if self.loading:
+            self.pending |= ids
+            return
+        worker.read(self, "changes", self.on_patched, lambda pager: (pager, ids, pager.lookup("so.order_id", ids)), self.pager)
+
+    def on_patched(self, result: tuple[KeysetPager, set[int], dict[int, sqlite3.Row]]) -> None:
+        pager, ids, fresh = result
+        if pager is not self.pager or self.loading:
+            self.pending |= ids
+            return
+        rows = list(self.rows)
+        if pager.window(rows, "so.order_id", ids, fresh, not self.more):
+            self.rows = rows
+            self.show_rows()
+        else:
+            self.refresh()
+
+    def show_rows(self) -> None:
+        started = time.perf_counter()
+        self.sync.apply([
+            (
+                str(row["order_id"]),
+                {
+                    "values": (row["order_id"], row["order_code"], row["customer_name"], row["state_title"], row["address"], row["created_on"], row["issued_on"], row["item_count"], f"{row['total_sum']:.2f}"),
+                    "tags": (("even" if idx % 2 == 0 else "odd"),),
+                },
             )
+            for idx, row in enumerate(self.rows)
+        ])
+        self.info_lbl.configure(text=f"Показано: {len(self.rows)}" + (" (прокрутите, чтобы загрузить ещё)" if self.more else ""))
+        self.app.overlay.add("render", (time.perf_counter() - started) * 1000)
+
+    def on_yscroll(self, first: str, last: str) -> None:
+        self.scrollbar.set(first, last)
+        if self.more and not self.loading and float(last) > 0.9:
+            self.loading = True
+            worker.read(self, "more", self.on_loaded, self.fetch_pages, self.pager, self.next_page, 1)
 
     def selected(self) -> int | None:
         sel = self.table.selection()
@@ -827,10 +1207,7 @@ class OrdersScreen(tk.Frame):
             return
         if not messagebox.askyesno("Подтверждение", "Удалить заказ?"):
             return
-        con = db()
-        con.execute("DELETE FROM sales_orders WHERE order_id=?", (oid,))
-        con.commit()
-        con.close()
+        store.delete_order(oid)
         self.refresh()
 
 
@@ -840,16 +1217,16 @@ class OrderForm(tk.Toplevel):
         self.parent = parent
         self.order_id = order_id
         self.items = []
+        self.keys = itertools.count(1)
         self.state_map = {}
         self.location_map = {}
-        self.item_map = {}
+        self.matches = []
+        self.lookup = Debouncer(self, self.search_items)
         self.title("Заказ ООО Обувь")
         self.geometry("980x690")
 
         self.build()
         self.load_refs()
-        if order_id:
-            self.load_order(order_id)
 
     def build(self) -> None:
         tk.Label(self, text="Карточка заказа", font=("Segoe UI", 20, "bold")).pack(pady=8)
@@ -889,12 +1266,20 @@ class OrderForm(tk.Toplevel):
 
         items_row = tk.Frame(side)
         items_row.pack(fill="x", pady=2)
-        self.pick_item = tk.StringVar()
+        self.pick_text = tk.StringVar()
         self.pick_qty = tk.StringVar(value="1")
-        self.item_combo = ttk.Combobox(items_row, textvariable=self.pick_item, state="readonly", width=40)
-        self.item_combo.pack(side=LEFT, padx=2)
+        tk.Label(items_row, text="Артикул / название:").pack(side=LEFT, padx=2)
+        pick_entry = tk.Entry(items_row, textvariable=self.pick_text, width=28)
+        pick_entry.pack(side=LEFT, padx=2)
         tk.Spinbox(items_row, from_=1, to=999, textvariable=self.pick_qty, width=8).pack(side=LEFT, padx=2)
         tk.Button(items_row, text="Добавить", bg="#28f08c", command=self.add_row).pack(side=LEFT, padx=4)
+        self.match_list = tk.Listbox(side, height=6, exportselection=False)
+        self.match_list.pack(fill="x", pady=2)
+        self.pick_text.trace_add("write", lambda *_: self.lookup(SEARCH_DELAY_MS))
+        pick_entry.bind("<Return>", lambda e: self.add_row())
+        pick_entry.bind("<Down>", lambda e: self.match_list.focus_set())
+        self.match_list.bind("<Return>", lambda e: self.add_row())
+        self.match_list.bind("<Double-Button-1>", lambda e: self.add_row())
 
         self.rows = ttk.Treeview(self, columns=("sku", "name", "qty", "sum"), show="headings", height=10, style="UGR.Treeview")
         for c, t, w in [("sku", "SKU", 120), ("name", "Товар", 440), ("qty", "Кол-во", 100), ("sum", "Сумма", 120)]:
@@ -903,6 +1288,7 @@ class OrderForm(tk.Toplevel):
         self.rows.tag_configure("odd", background="#f5f5f5")
         self.rows.tag_configure("even", background="#ffffff")
         self.rows.pack(fill="both", expand=True, pady=6)
+        self.sync = TreeSync(self.rows)
         tk.Button(side, text="Удалить позицию", command=self.remove_row).pack(anchor="w", pady=4)
 
         self.total_lbl = tk.Label(self, text="Итого: 0.00", font=("Segoe UI", 14, "bold"))
@@ -913,51 +1299,37 @@ class OrderForm(tk.Toplevel):
         tk.Button(btns, text="Сохранить", bg="#72f700", command=self.save).pack(side=LEFT, expand=True, fill="x", padx=2)
         tk.Button(btns, text="Отмена", command=self.destroy).pack(side=LEFT, expand=True, fill="x", padx=2)
 
+    def destroy(self) -> None:
+        self.lookup.cancel()
+        super().destroy()
+
     def load_refs(self) -> None:
-        con = db()
-        st = con.execute("SELECT state_id, title FROM order_states ORDER BY state_id").fetchall()
-        loc = con.execute("SELECT location_id, address FROM pickup_locations ORDER BY location_id").fetchall()
-        items = con.execute("SELECT item_id, sku, item_name, base_price, qty FROM stock_items ORDER BY item_name").fetchall()
-        con.close()
-
-        self.state_map = {r["title"]: r["state_id"] for r in st}
-        self.location_map = {r["address"]: r["location_id"] for r in loc}
-        self.item_map = {
-            f"{r['item_name']} ({r['sku']}) - {r['base_price']:.2f} [в наличии {r['qty']}]": (r["item_id"], r["sku"], r["item_name"], r["base_price"], r["qty"])
-            for r in items
-        }
+        worker.read(self, "refs", self.fill_refs, store.order_refs)
+
+    def fill_refs(self, refs: tuple[dict[str, int], dict[str, int]]) -> None:
+        self.state_map, self.location_map = refs
         self.state_combo["values"] = list(self.state_map.keys())
         self.location_combo["values"] = list(self.location_map.keys())
-        self.item_combo["values"] = list(self.item_map.keys())
         if self.state_combo["values"]:
             self.state_combo.current(0)
         if self.location_combo["values"]:
             self.location_combo.current(0)
-        if self.item_combo["values"]:
-            self.item_combo.current(0)
-
-    def load_order(self, order_id: int) -> None:
-        con = db()
-        head = con.execute(
-            """
-            SELECT so.*, st.title state_title, pl.address loc
-            FROM sales_orders so
-            JOIN order_states st ON st.state_id=so.state_id
-            JOIN pickup_locations pl ON pl.location_id=so.location_id
-            WHERE so.order_id=?
-            """,
-            (order_id,),
-        ).fetchone()
-        rows = con.execute(
-            """
-            SELECT sor.item_id, si.sku, si.item_name, sor.qty, sor.unit_price
-            FROM sales_order_rows sor
-            JOIN stock_items si ON si.item_id=sor.item_id
-            WHERE sor.order_id=?
-            """,
-            (order_id,),
-        ).fetchall()
-        con.close()
+        if self.order_id:
+            worker.read(self, "order", self.fill_order, store.load_order, self.order_id)
+
+    def search_items(self) -> None:
+        worker.read(self, "picker", self.fill_matches, store.item_search.find, self.pick_text.get())
+
+    def fill_matches(self, rows: list[sqlite3.Row]) -> None:
+        self.matches = rows
+        self.match_list.delete(0, "end")
+        for r in rows:
+            self.match_list.insert("end", f"{r['item_name']} ({r['sku']}) - {r['base_price']:.2f} [в наличии {r['qty']}]")
+        if rows:
+            self.match_list.selection_set(0)
+
+    def fill_order(self, order: tuple[sqlite3.Row | None, list[sqlite3.Row]]) -> None:
+        head, rows = order
         if not head:
             return
         self.code.set(head["order_code"])
@@ -966,12 +1338,15 @@ class OrderForm(tk.Toplevel):
         self.location.set(head["loc"])
         self.created.set(head["created_on"])
         self.issued.set(head["issued_on"])
-        self.items = [{"item_id": r["item_id"], "sku": r["sku"], "name": r["item_name"], "qty": r["qty"], "price": r["unit_price"]} for r in rows]
+        self.items = [
+            {"key": f"row{r['row_id']}", "row_id": r["row_id"], "item_id": r["item_id"], "sku": r["sku"], "name": r["item_name"], "qty": r["qty"], "price": r["unit_price"]}
+            for r in rows
+        ]
         self.repaint_rows()
 
     def add_row(self) -> None:
-        pick = self.pick_item.get().strip()
-        if not pick:
+        sel = self.match_list.curselection()
+        if not self.matches or not sel:
             return
         try:
             qty = int(self.pick_qty.get())
@@ -980,66 +1355,43 @@ class OrderForm(tk.Toplevel):
         except Exception:
             messagebox.showerror("Ошибка", "Количество должно быть больше нуля")
             return
-        item_id, sku, name, price, stock = self.item_map[pick]
+        pick = self.matches[sel[0]]
+        item_id, sku, name, price, stock = pick["item_id"], pick["sku"], pick["item_name"], pick["base_price"], pick["qty"]
         if qty > stock:
             messagebox.showerror("Ошибка", f"Недостаточно на складе. Доступно: {stock}")
             return
-        self.items.append({"item_id": item_id, "sku": sku, "name": name, "qty": qty, "price": price})
+        self.items.append({"key": f"new{next(self.keys)}", "row_id": None, "item_id": item_id, "sku": sku, "name": name, "qty": qty, "price": price})
         self.repaint_rows()
 
     def remove_row(self) -> None:
         sel = self.rows.selection()
         if not sel:
             return
-        index = self.rows.index(sel[0])
-        self.items.pop(index)
+        self.items = [r for r in self.items if r["key"] != sel[0]]
         self.repaint_rows()
 
     def repaint_rows(self) -> None:
-        self.rows.delete(*self.rows.get_children())
         total = 0.0
+        rows = []
         for idx, r in enumerate(self.items):
             cost = r["qty"] * r["price"]
             total += cost
-            self.rows.insert("", END, values=(r["sku"], r["name"], r["qty"], f"{cost:.2f}"), tags=(("even" if idx % 2 == 0 else "odd"),))
+            rows.append((r["key"], {"values": (r["sku"], r["name"], r["qty"], f"{cost:.2f}"), "tags": (("even" if idx % 2 == 0 else "odd"),)}))
+        self.sync.apply(rows)
         self.total_lbl.configure(text=f"Итого: {total:.2f}")
 
     def save(self) -> None:
         try:
-            code = self.code.get().strip()
-            customer = self.customer.get().strip()
-            state_id = self.state_map[self.state.get().strip()]
-            location_id = self.location_map[self.location.get().strip()]
-            created = self.created.get().strip()
-            issued = self.issued.get().strip()
-
-            if not code or not customer:
-                raise ValueError("Код заказа и клиент обязательны")
-            dt.date.fromisoformat(created)
-            dt.date.fromisoformat(issued)
-
-            con = db()
-            if self.order_id is None:
-                cur = con.execute(
-                    "INSERT INTO sales_orders(order_code, customer_name, state_id, location_id, created_on, issued_on) VALUES (?, ?, ?, ?, ?, ?)",
-                    (code, customer, state_id, location_id, created, issued),
-                )
-                oid = cur.lastrowid
-            else:
-                con.execute(
-                    "UPDATE sales_orders SET order_code=?, customer_name=?, state_id=?, location_id=?, created_on=?, issued_on=? WHERE order_id=?",
-                    (code, customer, state_id, location_id, created, issued, self.order_id),
-                )
-                oid = self.order_id
-                con.execute("DELETE FROM sales_order_rows WHERE order_id=?", (oid,))
-
-            for r in self.items:
-                con.execute(
-                    "INSERT INTO sales_order_rows(order_id, item_id, qty, unit_price) VALUES (?, ?, ?, ?)",
-                    (oid, r["item_id"], r["qty"], r["price"]),
-                )
-            con.commit()
-            con.close()
+            order = store.OrderData(
+                order_code=self.code.get().strip(),
+                customer_name=self.customer.get().strip(),
+                state_id=self.state_map[self.state.get().strip()],
+                location_id=self.location_map[self.location.get().strip()],
+                created_on=self.created.get().strip(),
+                issued_on=self.issued.get().strip(),
+                lines=[store.OrderLine(r["item_id"], r["qty"], r["price"], r["row_id"]) for r in self.items],
+            )
+            store.save_order(order, self.order_id)
             self.parent.refresh()
             self.destroy()
         except sqlite3.IntegrityError:
@@ -1048,10 +1400,143 @@ class OrderForm(tk.Toplevel):
             messagebox.showerror("Ошибка", str(ex))
 
 
+class AnalyticsScreen(tk.Frame):
+    def __init__(self, app: UrbanGearApp, user: dict) -> None:
+        super().__init__(app, padx=10, pady=10)
+        self.app = app
+        self.user = user
+        today = dt.date.today()
+        self.date_from = tk.StringVar(value=(today - dt.timedelta(days=29)).isoformat())
+        self.date_to = tk.StringVar(value=today.isoformat())
+        self.dimension = tk.StringVar(value="Товар")
+        self.location = tk.StringVar(value="Все пункты")
+        self.limit = tk.StringVar(value="20")
+        self.location_map = {"Все пункты": None}
+        self.schedule = Debouncer(self, self.refresh)
+        self.build()
+        worker.read(self, "filters", self.fill_filters, store.order_refs)
+        self.refresh()
+
+    def build(self) -> None:
+        top = tk.Frame(self)
+        top.pack(fill="x")
+        tk.Label(top, text="Аналитика продаж", font=("Segoe UI", 22, "bold")).pack(side=LEFT)
+        tk.Button(top, text="Назад", command=lambda: self.app.open_orders(self.user)).pack(side=RIGHT)
+
+        row = tk.LabelFrame(self, text="Параметры", padx=8, pady=6)
+        row.pack(fill="x", pady=8)
+        tk.Label(row, text="Период с").pack(side=LEFT, padx=(4, 4))
+        tk.Entry(row, textvariable=self.date_from, width=11).pack(side=LEFT, padx=4)
+        tk.Label(row, text="по").pack(side=LEFT)
+        tk.Entry(row, textvariable=self.date_to, width=11).pack(side=LEFT, padx=4)
+        tk.Label(row, text="Разрез:").pack(side=LEFT, padx=(10, 4))
+        ttk.Combobox(row, textvariable=self.dimension, state="readonly", width=14, values=list(SALES_DIMENSIONS)).pack(side=LEFT, padx=4)
+        tk.Label(row, text="Пункт выдачи:").pack(side=LEFT, padx=(10, 4))
+        self.location_combo = ttk.Combobox(row, textvariable=self.location, state="readonly", width=28)
+        self.location_combo.pack(side=LEFT, padx=4)
+        tk.Label(row, text="Топ:").pack(side=LEFT, padx=(10, 4))
+        tk.Spinbox(row, from_=5, to=100, increment=5, textvariable=self.limit, width=5).pack(side=LEFT, padx=4)
+        for var in (self.dimension, self.location, self.limit):
+            var.trace_add("write", lambda *_: self.schedule(FILTER_DELAY_MS))
+        for var in (self.date_from, self.date_to):
+            var.trace_add("write", lambda *_: self.schedule(SEARCH_DELAY_MS))
+
+        self.info_lbl = tk.Label(self, text="", anchor="w")
+        self.info_lbl.pack(fill="x", pady=(0, 6))
+
+        wrap = tk.Frame(self)
+        wrap.pack(fill="both", expand=True)
+        cols = ("title", "qty", "revenue", "prev", "change")
+        self.table = ttk.Treeview(wrap, columns=cols, show="headings", style="UGO.Treeview")
+        for col, title, width in [
+            ("title", "Наименование", 420), ("qty", "Продано", 90), ("revenue", "Выручка", 130),
+            ("prev", "Прошлый период", 130), ("change", "Изменение", 100),
+        ]:
+            self.table.heading(col, text=title, anchor="center")
+            self.table.column(col, width=width, anchor="w" if col == "title" else "e")
+        self.table.tag_configure("odd", background="#f5f5f5")
+        self.table.tag_configure("even", background="#ffffff")
+        self.table.pack(side=LEFT, fill="both", expand=True)
+        scrollbar = ttk.Scrollbar(wrap, orient=VERTICAL, command=self.table.yview)
+        scrollbar.pack(side=RIGHT, fill=Y)
+        self.table.configure(yscrollcommand=scrollbar.set)
+        self.sync = TreeSync(self.table)
+
+    def destroy(self) -> None:
+        self.schedule.cancel()
+        super().destroy()
+
+    def fill_filters(self, refs: tuple[dict[str, int], dict[str, int]]) -> None:
+        self.location_map = {"Все пункты": None, **refs[1]}
+        self.location_combo["values"] = list(self.location_map)
+
+    def refresh(self) -> None:
+        self.schedule.cancel()
+        try:
+            start, end = dt.date.fromisoformat(self.date_from.get().strip()), dt.date.fromisoformat(self.date_to.get().strip())
+            limit = int(self.limit.get())
+        except ValueError:
+            self.info_lbl.configure(text="Укажите даты в формате ГГГГ-ММ-ДД и число строк")
+            return
+        if start > end:
+            self.info_lbl.configure(text="Начало периода позже конца")
+            return
+        query = store.SalesQuery(
+            start.isoformat(), end.isoformat(), SALES_DIMENSIONS[self.dimension.get()], self.location_map.get(self.location.get()), max(1, limit)
+        )
+        self.app.overlay.reset()
+        worker.read(self, "report", self.on_loaded, store.sales_report, query)
+
+    def apply_changes(self, changes: dict[str, set[int]] | None) -> None:
+        if changes is None or "sales_orders" in changes or "sales_order_rows" in changes:
+            self.schedule(FILTER_DELAY_MS)
+
+    @staticmethod
+    def change(current: float, previous: float | None) -> str:
+        if not previous:
+            return "—"
+        return f"{(current - previous) / previous * 100:+.1f}%"
+
+    def on_loaded(self, report: store.SalesReport) -> None:
+        started = time.perf_counter()
+        totals, prev = report.totals, report.prev_totals
+        self.info_lbl.configure(
+            text=f"Заказов: {totals.orders} | Продано: {totals.qty} | Выручка: {totals.revenue:.2f} | "
+            f"прошлый период: {prev.revenue:.2f} ({self.change(totals.revenue, prev.revenue)})"
+        )
+        series = report.query.dimension in store.SALES_SERIES
+        self.sync.apply([
+            (
+                str(row["key"]),
+                {
+                    "values": (
+                        row["title"], row["qty"], f"{row['revenue']:.2f}",
+                        "" if series else f"{report.previous.get(row['key'], 0):.2f}",
+                        "" if series else self.change(row["revenue"], report.previous.get(row["key"])),
+                    ),
+                    "tags": (("even" if idx % 2 == 0 else "odd"),),
+                },
+            )
+            for idx, row in enumerate(report.rows)
+        ])
+        self.app.overlay.add("render", (time.perf_counter() - started) * 1000)
+
+
 def main() -> None:
-    setup_database()
+    started = time.perf_counter()
+    code = store.run_command(store.command_parser().parse_args())
+    if code is not None:
+        raise SystemExit(code)
     app = UrbanGearApp()
+    if store.tracer.enabled:
+        app.after_idle(lambda: print(f"Окно входа готово через {(time.perf_counter() - started) * 1000:.0f} мс после запуска main()"))
     app.mainloop()
+    worker.shutdown()
+    if store.tracer.enabled:
+        store.tracer.print_report()
+    with store.connections.write() as con:
+        store.prune_changes(con)
+    store.connections.close()
 
 
 if __name__ == "__main__":
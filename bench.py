@@ -0,0 +1,327 @@
+import argparse
+import datetime as dt
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import store
+
+
+BENCH_DB = store.ROOT / "bench.db"
+BENCH_SEED = 20260301
+ADJECTIVES = ["Городской", "Зимний", "Легкий", "Треккинговый", "Беговой", "Классический", "Компактный", "Теплый", "Водостойкий", "Спортивный"]
+NOUNS = ["Куртка", "Рюкзак", "Кроссовки", "Кеды", "Сумка", "Ботинки", "Жилет", "Парка", "Шапка", "Перчатки", "Брюки", "Худи"]
+MODELS = ["Storm", "Polar", "City", "Metro", "Trail", "Sling", "Dash", "Sprint", "Street", "Aero", "Nord", "Peak", "Flow", "Edge"]
+SYLLABLES = ["ал", "бер", "вин", "гор", "дан", "ер", "жел", "зар", "кам", "лес", "мир", "нор", "ост", "пар", "рус", "сев", "тор", "уни"]
+SURNAMES = ["Иванов", "Петров", "Смирнов", "Кузнецов", "Попов", "Соколов", "Лебедев", "Козлов", "Новиков", "Морозов", "Волков", "Орлов"]
+NAMES = ["Анна", "Иван", "Мария", "Олег", "Елена", "Денис", "Ирина", "Павел", "Ольга", "Сергей"]
+
+
+def company(rng: random.Random, kind: str, n: int) -> str:
+    return f"{''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()} {kind} {n}"
+
+
+def make_photos(rng: random.Random, out_dir: Path, count: int) -> list[tuple[str, str]]:
+    from PIL import Image, ImageDraw
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    photos = []
+    for n in range(count):
+        img = Image.new("RGB", (1200, 800), tuple(rng.randrange(256) for _ in range(3)))
+        draw = ImageDraw.Draw(img)
+        for _ in range(6):
+            x, y = rng.randrange(1000), rng.randrange(600)
+            draw.ellipse((x, y, x + rng.randint(60, 400), y + rng.randint(60, 300)), fill=tuple(rng.randrange(256) for _ in range(3)))
+        pair = []
+        for size, suffix in ((store.PREVIEW_SIZE, ""), (store.THUMB_SIZE, "_thumb")):
+            target = out_dir / f"bench_{n:04d}{suffix}.jpg"
+            store.fit_image(img, size).save(target, "JPEG", quality=store.IMAGE_QUALITY, optimize=True)
+            pair.append(str(target))
+        photos.append((pair[0], pair[1]))
+    return photos
+
+
+def generate(
+    path: Path,
+    items: int = 100_000,
+    order_rows: int = 1_000_000,
+    vendors: int = 2000,
+    makers: int = 3000,
+    groups: int = 80,
+    photos: int = 200,
+    seed: int = BENCH_SEED,
+) -> dict:
+    started = time.perf_counter()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{path}{suffix}").unlink(missing_ok=True)
+    rng = random.Random(seed)
+    store.open_database(path)
+    store.seed_database()
+    pictures = make_photos(rng, path.with_name(f"{path.stem}_images"), photos)
+    with store.connections.write() as con:
+        for table, kind, count in (("vendors", "Поставщик", vendors), ("makers", "Бренд", makers), ("groups", "Группа", groups)):
+            con.executemany(f"INSERT OR IGNORE INTO {table}(title) VALUES (?)", [(company(rng, kind, n),) for n in range(count)])
+        for n in range(8):
+            con.execute("INSERT OR IGNORE INTO pickup_locations(address) VALUES (?)", (f"г. Москва, ул. Складская, {n + 1}",))
+        ids = {
+            table: [row[0] for row in con.execute(f"SELECT {col} FROM {table}")]
+            for table, col in (
+                ("vendors", "vendor_id"), ("makers", "maker_id"), ("groups", "group_id"), ("measures", "measure_id"),
+                ("order_states", "state_id"), ("pickup_locations", "location_id"),
+            )
+        }
+
+        def item_row(n: int) -> tuple:
+            photo, thumb = rng.choice(pictures) if pictures and rng.random() < 0.3 else (None, None)
+            noun = rng.choice(NOUNS)
+            return (
+                f"BN-{n:07d}", f"{noun} {rng.choice(MODELS)} {n % 997}", rng.choice(ids["groups"]),
+                f"{rng.choice(ADJECTIVES)} {noun.lower()}", rng.choice(ids["makers"]), rng.choice(ids["vendors"]),
+                round(rng.uniform(300, 25000), 2), rng.choice(ids["measures"]), rng.choice([0] * 2 + list(range(1, 60))),
+                rng.choice([0, 0, 0, 5, 10, 15, 20, 30]), photo, thumb,
+            )
+
+        con.executemany(
+            """
+            INSERT INTO stock_items(sku, item_name, group_id, about, maker_id, vendor_id, base_price, measure_id, qty, promo, photo_path, thumb_path)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (item_row(n) for n in range(items)),
+        )
+        item_ids = [row[0] for row in con.execute("SELECT item_id FROM stock_items")]
+        prices = dict(con.execute("SELECT item_id, base_price FROM stock_items"))
+        start_day = dt.date(2024, 1, 1)
+        order_count = max(1, order_rows // 4)
+        for n in range(order_count):
+            created = start_day + dt.timedelta(days=rng.randrange(800))
+            con.execute(
+                "INSERT INTO sales_orders(order_code, customer_name, state_id, location_id, created_on, issued_on) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    f"BO-{n:07d}", f"{rng.choice(SURNAMES)} {rng.choice(NAMES)}", rng.choice(ids["order_states"]),
+                    rng.choice(ids["pickup_locations"]), created.isoformat(), (created + dt.timedelta(days=rng.randint(1, 7))).isoformat(),
+                ),
+            )
+        order_ids = [row[0] for row in con.execute("SELECT order_id FROM sales_orders WHERE order_code LIKE 'BO-%'")]
+        lines = []
+        for n in range(order_rows):
+            item_id = rng.choice(item_ids)
+            lines.append((order_ids[n % len(order_ids)], item_id, rng.randint(1, 3), prices[item_id]))
+        con.executemany("INSERT INTO sales_order_rows(order_id, item_id, qty, unit_price) VALUES (?, ?, ?, ?)", lines)
+    with store.connections.write() as con:
+        con.execute("DELETE FROM change_log")
+        con.execute("ANALYZE")
+    return {"path": str(path), "seconds": time.perf_counter() - started, **database_counts()}
+
+
+def database_counts() -> dict[str, int]:
+    con = store.connections.read()
+    return {
+        table: con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        for table in ("stock_items", "vendors", "makers", "sales_orders", "sales_order_rows")
+    }
+
+
+def measure(fn, repeat: int) -> dict:
+    fn()
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    times.sort()
+    return {
+        "runs": repeat,
+        "min_ms": round(times[0], 3),
+        "median_ms": round(statistics.median(times), 3),
+        "p95_ms": round(times[min(len(times) - 1, int(len(times) * 0.95))], 3),
+        "mean_ms": round(statistics.fmean(times), 3),
+    }
+
+
+def benchmarks(rng: random.Random) -> dict:
+    con = store.connections.read()
+    vendor_id = con.execute("SELECT vendor_id FROM stock_items GROUP BY vendor_id ORDER BY COUNT(*) DESC LIMIT 1").fetchone()[0]
+    item_ids = rng.sample([row[0] for row in con.execute("SELECT item_id FROM stock_items")], 500)
+    stocked = [row[0] for row in con.execute("SELECT item_id FROM stock_items WHERE qty >= 40")]
+    last_day = con.execute("SELECT MAX(day) FROM sales_totals").fetchone()[0] or dt.date.today().isoformat()
+    photos = [row[0] for row in con.execute("SELECT DISTINCT thumb_path FROM stock_items WHERE thumb_path IS NOT NULL LIMIT 60")]
+    photos += [None, str(store.PLACEHOLDER)] * 10
+    state_id = con.execute("SELECT state_id FROM order_states LIMIT 1").fetchone()[0]
+    location_id = con.execute("SELECT location_id FROM pickup_locations LIMIT 1").fetchone()[0]
+    total = con.execute("SELECT COUNT(*) FROM stock_items").fetchone()[0]
+
+    def catalog(query: store.CatalogQuery, first: int = 0):
+        def run():
+            pager = store.catalog_pager(query)
+            store.catalog_counts(query)
+            pager.rows(first, first + 20)
+        return run
+
+    snapshot = store.CatalogSnapshot.load()
+
+    def snapshot_view(query: store.CatalogQuery, first: int = 0):
+        def run():
+            view = snapshot.view(query)
+            view.counts()
+            view.rows(first, first + 20)
+        return run
+
+    def snapshot_patch():
+        ids = set(rng.sample(item_ids, 5))
+        snapshot.apply(ids, store.CatalogSnapshot.fetch(ids))
+
+    def thumbnails(warm: bool):
+        from app_v2 import ThumbnailCache
+
+        cache = ThumbnailCache(Path(tempfile.mkdtemp(prefix="ug-bench-")))
+        if warm:
+            for path in photos:
+                cache.image(path, store.THUMB_SIZE)
+
+        def run():
+            for path in photos:
+                cache.image(path, store.THUMB_SIZE)
+            if not warm:
+                for entry in cache.cache_dir.glob("*.png"):
+                    entry.unlink()
+        return run
+
+    def order_save():
+        lines = [store.OrderLine(item_id, 1, 100.0) for item_id in rng.sample(stocked, 5)]
+        order = store.OrderData(f"BENCH-{time.perf_counter_ns()}", "Бенчмарк", state_id, location_id, "2026-01-01", "2026-01-02", lines)
+        order_id = store.save_order(order)
+        order.lines = order.lines[:3]
+        store.save_order(order, order_id)
+        store.delete_order(order_id)
+
+    def delete_check():
+        reader = store.connections.read()
+        for item_id in rng.sample(item_ids, 50):
+            reader.execute("SELECT 1 FROM sales_order_rows WHERE item_id=? LIMIT 1", (item_id,)).fetchone()
+
+    def item_delete():
+        refs = store.item_refs()
+        item = store.ItemData(
+            f"BENCH-{time.perf_counter_ns()}", "Бенчмарк", next(iter(refs["group"].values())), "", next(iter(refs["maker"].values())),
+            vendor_id, 100.0, next(iter(refs["measure"].values())), 1, 0,
+        )
+        store.delete_item(store.save_item(item))
+
+    def orders_page(query: store.OrderQuery):
+        def run():
+            pager = store.orders_pager(query)
+            pager.count("COUNT(*) total, SUM(so.total_sum) revenue")
+            pager.fetch(0)
+        return run
+
+    def startup():
+        subprocess.run(
+            [sys.executable, "-c", "import sys, app_v2; app_v2.store.open_database(sys.argv[1]); app_v2.store.setup_database()", str(store.connections.path)],
+            check=True,
+            cwd=store.ROOT,
+        )
+
+    def sales(dimension: str, days: int):
+        end = dt.date.fromisoformat(last_day)
+        query = store.SalesQuery((end - dt.timedelta(days=days - 1)).isoformat(), end.isoformat(), dimension)
+        return lambda: store.sales_report(query)
+
+    suite = {
+        "startup: imports + schema check": (startup, 10),
+        "catalog: first page": (catalog(store.CatalogQuery()), 30),
+        "catalog: search": (catalog(store.CatalogQuery("куртка storm")), 30),
+        "catalog: search prefix": (catalog(store.CatalogQuery("кр")), 10),
+        "catalog: vendor filter": (catalog(store.CatalogQuery(vendor_id=vendor_id)), 30),
+        "catalog: qty asc": (catalog(store.CatalogQuery(sort="qty")), 30),
+        "catalog: qty desc": (catalog(store.CatalogQuery(sort="-qty")), 30),
+        "catalog: price desc": (catalog(store.CatalogQuery(sort="-price")), 30),
+        "catalog: price range": (catalog(store.CatalogQuery(sort="price", price_from="1000", price_to="3000")), 30),
+        "catalog: vendor + promo desc": (catalog(store.CatalogQuery(vendor_id=vendor_id, sort="-promo")), 30),
+        "catalog: name": (catalog(store.CatalogQuery(sort="name")), 30),
+        "catalog: name, deep jump": (catalog(store.CatalogQuery(sort="name"), total // 2), 10),
+        "catalog: deep jump": (catalog(store.CatalogQuery(), total // 2), 10),
+        "snapshot: load": (store.CatalogSnapshot.load, 5),
+        "snapshot: first page": (snapshot_view(store.CatalogQuery()), 30),
+        "snapshot: price desc": (snapshot_view(store.CatalogQuery(sort="-price")), 30),
+        "snapshot: vendor + name": (snapshot_view(store.CatalogQuery(vendor_id=vendor_id, sort="name")), 30),
+        "snapshot: price range + promo desc": (snapshot_view(store.CatalogQuery(sort="-promo", price_from="1000", price_to="3000")), 30),
+        "snapshot: name, deep jump": (snapshot_view(store.CatalogQuery(sort="name"), total // 2), 30),
+        "snapshot: patch 5 items": (snapshot_patch, 30),
+        "thumbnails: cold": (thumbnails(False), 5),
+        "thumbnails: warm": (thumbnails(True), 10),
+        "orders: first page + aggregate": (orders_page(store.OrderQuery()), 30),
+        "orders: state + aggregate": (orders_page(store.OrderQuery(state_id=state_id)), 30),
+        "orders: date range + aggregate": (orders_page(store.OrderQuery(date_from="2025-01-01", date_to="2025-03-31")), 30),
+        "order save": (order_save, 30),
+        "item delete: usage check x50": (delete_check, 30),
+        "item delete: create + delete": (item_delete, 30),
+        "sales: top items, 30 days": (sales("item", 30), 10),
+        "sales: top items, 365 days": (sales("item", 365), 5),
+        "sales: top vendors, 365 days": (sales("vendor", 365), 5),
+        "sales: locations, 365 days": (sales("location", 365), 30),
+        "sales: by month, 730 days": (sales("month", 730), 30),
+    }
+    return {name: measure(fn, repeat) for name, (fn, repeat) in suite.items()}
+
+
+def run_benchmarks(path: Path, out: Path | None = None, seed: int = BENCH_SEED) -> dict:
+    store.open_database(path)
+    report = {
+        "meta": {
+            "timestamp": dt.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "db": str(path),
+            "counts": database_counts(),
+        },
+        "results": benchmarks(random.Random(seed)),
+    }
+    if out:
+        out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    store.connections.close()
+    return report
+
+
+def print_report(report: dict, baseline: dict | None = None) -> None:
+    base = (baseline or {}).get("results", {})
+    for name, stats in report["results"].items():
+        line = f"{name:34} {stats['median_ms']:10.3f} ms  p95 {stats['p95_ms']:10.3f} ms"
+        if name in base and base[name]["median_ms"]:
+            line += f"  x{stats['median_ms'] / base[name]['median_ms']:.2f}"
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="UrbanGear: генерация данных и замеры")
+    parser.add_argument("command", choices=["generate", "run"])
+    parser.add_argument("--db", type=Path, default=BENCH_DB)
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--order-rows", type=int, default=1_000_000)
+    parser.add_argument("--vendors", type=int, default=2000)
+    parser.add_argument("--makers", type=int, default=3000)
+    parser.add_argument("--photos", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=BENCH_SEED)
+    parser.add_argument("--out", type=Path, help="куда записать результаты в JSON")
+    parser.add_argument("--compare", type=Path, help="JSON прошлого прогона для сравнения")
+    args = parser.parse_args()
+    if args.command == "generate":
+        stats = generate(args.db, args.items, args.order_rows, args.vendors, args.makers, photos=args.photos, seed=args.seed)
+        store.connections.close()
+        print(json.dumps(stats, ensure_ascii=False, indent=2))
+        return
+    report = run_benchmarks(args.db, args.out, args.seed)
+    baseline = json.loads(args.compare.read_text(encoding="utf-8")) if args.compare else None
+    print_report(report, baseline)
+
+
+if __name__ == "__main__":
+    main()
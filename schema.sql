@@ -41,6 +41,9 @@ CREATE TABLE IF NOT EXISTS stock_items (
   qty INTEGER NOT NULL CHECK(qty >= 0),
   promo REAL NOT NULL DEFAULT 0 CHECK(promo >= 0 AND promo <= 100),
   photo_path TEXT,
+  thumb_path TEXT,
+  row_version INTEGER NOT NULL DEFAULT 0,
+  final_price REAL GENERATED ALWAYS AS (ROUND(base_price * (1 - promo / 100.0), 2)) VIRTUAL,
   FOREIGN KEY(group_id) REFERENCES groups(group_id),
   FOREIGN KEY(maker_id) REFERENCES makers(maker_id),
   FOREIGN KEY(vendor_id) REFERENCES vendors(vendor_id),
@@ -65,6 +68,8 @@ CREATE TABLE IF NOT EXISTS sales_orders (
   location_id INTEGER NOT NULL,
   created_on TEXT NOT NULL,
   issued_on TEXT NOT NULL,
+  total_sum REAL NOT NULL DEFAULT 0,
+  item_count INTEGER NOT NULL DEFAULT 0,
   FOREIGN KEY(state_id) REFERENCES order_states(state_id),
   FOREIGN KEY(location_id) REFERENCES pickup_locations(location_id)
 );
@@ -75,6 +80,241 @@ CREATE TABLE IF NOT EXISTS sales_order_rows (
   item_id INTEGER NOT NULL,
   qty INTEGER NOT NULL CHECK(qty > 0),
   unit_price REAL NOT NULL CHECK(unit_price >= 0),
+  reserved INTEGER NOT NULL DEFAULT 0,
   FOREIGN KEY(order_id) REFERENCES sales_orders(order_id) ON DELETE CASCADE,
   FOREIGN KEY(item_id) REFERENCES stock_items(item_id)
 );
+
+CREATE INDEX IF NOT EXISTS idx_stock_items_group ON stock_items(group_id);
+CREATE INDEX IF NOT EXISTS idx_stock_items_maker ON stock_items(maker_id);
+CREATE INDEX IF NOT EXISTS idx_stock_items_vendor ON stock_items(vendor_id);
+CREATE INDEX IF NOT EXISTS idx_stock_items_measure ON stock_items(measure_id);
+CREATE INDEX IF NOT EXISTS idx_stock_items_qty ON stock_items(qty);
+CREATE INDEX IF NOT EXISTS idx_stock_items_vendor_qty ON stock_items(vendor_id, qty);
+CREATE INDEX IF NOT EXISTS idx_stock_items_final_price ON stock_items(final_price);
+CREATE INDEX IF NOT EXISTS idx_stock_items_vendor_final_price ON stock_items(vendor_id, final_price);
+CREATE INDEX IF NOT EXISTS idx_stock_items_promo ON stock_items(promo);
+CREATE INDEX IF NOT EXISTS idx_stock_items_vendor_promo ON stock_items(vendor_id, promo);
+CREATE INDEX IF NOT EXISTS idx_stock_items_name ON stock_items(item_name);
+CREATE INDEX IF NOT EXISTS idx_stock_items_vendor_name ON stock_items(vendor_id, item_name);
+DROP INDEX IF EXISTS idx_sales_orders_state;
+DROP INDEX IF EXISTS idx_sales_orders_location;
+DROP INDEX IF EXISTS idx_sales_orders_customer;
+CREATE INDEX IF NOT EXISTS idx_sales_orders_created ON sales_orders(created_on);
+CREATE INDEX IF NOT EXISTS idx_sales_orders_state_created ON sales_orders(state_id, created_on);
+CREATE INDEX IF NOT EXISTS idx_sales_orders_location_created ON sales_orders(location_id, created_on);
+CREATE INDEX IF NOT EXISTS idx_sales_orders_issued ON sales_orders(issued_on, order_id);
+CREATE INDEX IF NOT EXISTS idx_sales_orders_state_issued ON sales_orders(state_id, issued_on);
+CREATE INDEX IF NOT EXISTS idx_sales_orders_location_issued ON sales_orders(location_id, issued_on);
+CREATE INDEX IF NOT EXISTS idx_sales_order_rows_order ON sales_order_rows(order_id);
+CREATE INDEX IF NOT EXISTS idx_sales_order_rows_item ON sales_order_rows(item_id);
+
+CREATE TRIGGER IF NOT EXISTS sales_order_rows_total_ai AFTER INSERT ON sales_order_rows BEGIN
+  UPDATE sales_orders
+  SET total_sum = ROUND(total_sum + new.qty * new.unit_price, 2), item_count = item_count + new.qty
+  WHERE order_id = new.order_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS sales_order_rows_total_au AFTER UPDATE OF order_id, qty, unit_price ON sales_order_rows BEGIN
+  UPDATE sales_orders
+  SET total_sum = ROUND(total_sum - old.qty * old.unit_price, 2), item_count = item_count - old.qty
+  WHERE order_id = old.order_id;
+  UPDATE sales_orders
+  SET total_sum = ROUND(total_sum + new.qty * new.unit_price, 2), item_count = item_count + new.qty
+  WHERE order_id = new.order_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS sales_order_rows_total_ad AFTER DELETE ON sales_order_rows BEGIN
+  UPDATE sales_orders
+  SET total_sum = ROUND(total_sum - old.qty * old.unit_price, 2), item_count = item_count - old.qty
+  WHERE order_id = old.order_id;
+END;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS catalog_fts USING fts5(
+  sku, item_name, group_title, about, maker_title, vendor_title,
+  tokenize = "unicode61 remove_diacritics 2",
+  prefix = '1 2 3'
+);
+
+CREATE TABLE IF NOT EXISTS catalog_fts_pause (
+  paused INTEGER PRIMARY KEY
+);
+
+CREATE TRIGGER IF NOT EXISTS stock_items_fts_ai AFTER INSERT ON stock_items
+WHEN NOT EXISTS (SELECT 1 FROM catalog_fts_pause) BEGIN
+  INSERT INTO catalog_fts(rowid, sku, item_name, group_title, about, maker_title, vendor_title)
+  SELECT new.item_id, new.sku, new.item_name,
+         (SELECT title FROM groups WHERE group_id = new.group_id), new.about,
+         (SELECT title FROM makers WHERE maker_id = new.maker_id),
+         (SELECT title FROM vendors WHERE vendor_id = new.vendor_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS stock_items_fts_au AFTER UPDATE OF sku, item_name, group_id, about, maker_id, vendor_id ON stock_items
+WHEN NOT EXISTS (SELECT 1 FROM catalog_fts_pause) BEGIN
+  DELETE FROM catalog_fts WHERE rowid = old.item_id;
+  INSERT INTO catalog_fts(rowid, sku, item_name, group_title, about, maker_title, vendor_title)
+  SELECT new.item_id, new.sku, new.item_name,
+         (SELECT title FROM groups WHERE group_id = new.group_id), new.about,
+         (SELECT title FROM makers WHERE maker_id = new.maker_id),
+         (SELECT title FROM vendors WHERE vendor_id = new.vendor_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS stock_items_fts_ad AFTER DELETE ON stock_items BEGIN
+  DELETE FROM catalog_fts WHERE rowid = old.item_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS groups_fts_au AFTER UPDATE OF title ON groups BEGIN
+  UPDATE catalog_fts SET group_title = new.title
+  WHERE rowid IN (SELECT item_id FROM stock_items WHERE group_id = new.group_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS makers_fts_au AFTER UPDATE OF title ON makers BEGIN
+  UPDATE catalog_fts SET maker_title = new.title
+  WHERE rowid IN (SELECT item_id FROM stock_items WHERE maker_id = new.maker_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS vendors_fts_au AFTER UPDATE OF title ON vendors BEGIN
+  UPDATE catalog_fts SET vendor_title = new.title
+  WHERE rowid IN (SELECT item_id FROM stock_items WHERE vendor_id = new.vendor_id);
+END;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS orders_fts USING fts5(
+  order_code, customer_name,
+  tokenize = "unicode61 remove_diacritics 2",
+  prefix = '1 2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS sales_orders_fts_ai AFTER INSERT ON sales_orders BEGIN
+  INSERT INTO orders_fts(rowid, order_code, customer_name) VALUES (new.order_id, new.order_code, new.customer_name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS sales_orders_fts_au AFTER UPDATE OF order_code, customer_name ON sales_orders BEGIN
+  UPDATE orders_fts SET order_code = new.order_code, customer_name = new.customer_name WHERE rowid = old.order_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS sales_orders_fts_ad AFTER DELETE ON sales_orders BEGIN
+  DELETE FROM orders_fts WHERE rowid = old.order_id;
+END;
+
+CREATE TABLE IF NOT EXISTS sales_daily (
+  day TEXT NOT NULL,
+  item_id INTEGER NOT NULL,
+  location_id INTEGER NOT NULL,
+  qty INTEGER NOT NULL DEFAULT 0,
+  revenue REAL NOT NULL DEFAULT 0,
+  PRIMARY KEY(day, item_id, location_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS sales_totals (
+  day TEXT NOT NULL,
+  location_id INTEGER NOT NULL,
+  orders INTEGER NOT NULL DEFAULT 0,
+  qty INTEGER NOT NULL DEFAULT 0,
+  revenue REAL NOT NULL DEFAULT 0,
+  PRIMARY KEY(day, location_id)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS sales_order_rows_rollup_ai AFTER INSERT ON sales_order_rows BEGIN
+  INSERT INTO sales_daily(day, item_id, location_id, qty, revenue)
+  SELECT created_on, new.item_id, location_id, new.qty, new.qty * new.unit_price FROM sales_orders WHERE order_id = new.order_id
+  ON CONFLICT(day, item_id, location_id) DO UPDATE SET qty = qty + excluded.qty, revenue = revenue + excluded.revenue;
+  INSERT INTO sales_totals(day, location_id, orders, qty, revenue)
+  SELECT created_on, location_id, 0, new.qty, new.qty * new.unit_price FROM sales_orders WHERE order_id = new.order_id
+  ON CONFLICT(day, location_id) DO UPDATE SET orders = orders + excluded.orders, qty = qty + excluded.qty, revenue = revenue + excluded.revenue;
+END;
+
+CREATE TRIGGER IF NOT EXISTS sales_order_rows_rollup_au AFTER UPDATE OF order_id, item_id, qty, unit_price ON sales_order_rows BEGIN
+  INSERT INTO sales_daily(day, item_id, location_id, qty, revenue)
+  SELECT created_on, old.item_id, location_id, -old.qty, -old.qty * old.unit_price FROM sales_orders WHERE order_id = old.order_id
+  ON CONFLICT(day, item_id, location_id) DO UPDATE SET qty = qty + excluded.qty, revenue = revenue + excluded.revenue;
+  INSERT INTO sales_totals(day, location_id, orders, qty, revenue)
+  SELECT created_on, location_id, 0, -old.qty, -old.qty * old.unit_price FROM sales_orders WHERE order_id = old.order_id
+  ON CONFLICT(day, location_id) DO UPDATE SET orders = orders + excluded.orders, qty = qty + excluded.qty, revenue = revenue + excluded.revenue;
+  INSERT INTO sales_daily(day, item_id, location_id, qty, revenue)
+  SELECT created_on, new.item_id, location_id, new.qty, new.qty * new.unit_price FROM sales_orders WHERE order_id = new.order_id
+  ON CONFLICT(day, item_id, location_id) DO UPDATE SET qty = qty + excluded.qty, revenue = revenue + excluded.revenue;
+  INSERT INTO sales_totals(day, location_id, orders, qty, revenue)
+  SELECT created_on, location_id, 0, new.qty, new.qty * new.unit_price FROM sales_orders WHERE order_id = new.order_id
+  ON CONFLICT(day, location_id) DO UPDATE SET orders = orders + excluded.orders, qty = qty + excluded.qty, revenue = revenue + excluded.revenue;
+END;
+
+CREATE TRIGGER IF NOT EXISTS sales_order_rows_rollup_ad AFTER DELETE ON sales_order_rows BEGIN
+  INSERT INTO sales_daily(day, item_id, location_id, qty, revenue)
+  SELECT created_on, old.item_id, location_id, -old.qty, -old.qty * old.unit_price FROM sales_orders WHERE order_id = old.order_id
+  ON CONFLICT(day, item_id, location_id) DO UPDATE SET qty = qty + excluded.qty, revenue = revenue + excluded.revenue;
+  INSERT INTO sales_totals(day, location_id, orders, qty, revenue)
+  SELECT created_on, location_id, 0, -old.qty, -old.qty * old.unit_price FROM sales_orders WHERE order_id = old.order_id
+  ON CONFLICT(day, location_id) DO UPDATE SET orders = orders + excluded.orders, qty = qty + excluded.qty, revenue = revenue + excluded.revenue;
+END;
+
+CREATE TRIGGER IF NOT EXISTS sales_orders_rollup_ai AFTER INSERT ON sales_orders BEGIN
+  INSERT INTO sales_totals(day, location_id, orders, qty, revenue) VALUES (new.created_on, new.location_id, 1, 0, 0)
+  ON CONFLICT(day, location_id) DO UPDATE SET orders = orders + excluded.orders, qty = qty + excluded.qty, revenue = revenue + excluded.revenue;
+END;
+
+CREATE TRIGGER IF NOT EXISTS sales_orders_rollup_au AFTER UPDATE OF created_on, location_id ON sales_orders
+WHEN old.created_on IS NOT new.created_on OR old.location_id IS NOT new.location_id BEGIN
+  INSERT INTO sales_daily(day, item_id, location_id, qty, revenue)
+  SELECT old.created_on, item_id, old.location_id, -SUM(qty), -SUM(qty * unit_price) FROM sales_order_rows WHERE order_id = old.order_id GROUP BY item_id
+  ON CONFLICT(day, item_id, location_id) DO UPDATE SET qty = qty + excluded.qty, revenue = revenue + excluded.revenue;
+  INSERT INTO sales_totals(day, location_id, orders, qty, revenue)
+  SELECT old.created_on, old.location_id, -1, -COALESCE(SUM(qty), 0), -COALESCE(SUM(qty * unit_price), 0) FROM sales_order_rows WHERE order_id = old.order_id
+  ON CONFLICT(day, location_id) DO UPDATE SET orders = orders + excluded.orders, qty = qty + excluded.qty, revenue = revenue + excluded.revenue;
+  INSERT INTO sales_daily(day, item_id, location_id, qty, revenue)
+  SELECT new.created_on, item_id, new.location_id, SUM(qty), SUM(qty * unit_price) FROM sales_order_rows WHERE order_id = new.order_id GROUP BY item_id
+  ON CONFLICT(day, item_id, location_id) DO UPDATE SET qty = qty + excluded.qty, revenue = revenue + excluded.revenue;
+  INSERT INTO sales_totals(day, location_id, orders, qty, revenue)
+  SELECT new.created_on, new.location_id, 1, COALESCE(SUM(qty), 0), COALESCE(SUM(qty * unit_price), 0) FROM sales_order_rows WHERE order_id = new.order_id
+  ON CONFLICT(day, location_id) DO UPDATE SET orders = orders + excluded.orders, qty = qty + excluded.qty, revenue = revenue + excluded.revenue;
+END;
+
+CREATE TRIGGER IF NOT EXISTS sales_orders_rollup_bd BEFORE DELETE ON sales_orders BEGIN
+  INSERT INTO sales_daily(day, item_id, location_id, qty, revenue)
+  SELECT old.created_on, item_id, old.location_id, -SUM(qty), -SUM(qty * unit_price) FROM sales_order_rows WHERE order_id = old.order_id GROUP BY item_id
+  ON CONFLICT(day, item_id, location_id) DO UPDATE SET qty = qty + excluded.qty, revenue = revenue + excluded.revenue;
+  INSERT INTO sales_totals(day, location_id, orders, qty, revenue)
+  SELECT old.created_on, old.location_id, -1, -COALESCE(SUM(qty), 0), -COALESCE(SUM(qty * unit_price), 0) FROM sales_order_rows WHERE order_id = old.order_id
+  ON CONFLICT(day, location_id) DO UPDATE SET orders = orders + excluded.orders, qty = qty + excluded.qty, revenue = revenue + excluded.revenue;
+END;
+
+CREATE TABLE IF NOT EXISTS change_log (
+  change_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  table_name TEXT NOT NULL,
+  row_id INTEGER NOT NULL
+);
+
+CREATE TRIGGER IF NOT EXISTS stock_items_log_ai AFTER INSERT ON stock_items BEGIN
+  INSERT INTO change_log(table_name, row_id) VALUES ('stock_items', new.item_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS stock_items_log_au AFTER UPDATE ON stock_items BEGIN
+  INSERT INTO change_log(table_name, row_id) VALUES ('stock_items', new.item_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS stock_items_log_ad AFTER DELETE ON stock_items BEGIN
+  INSERT INTO change_log(table_name, row_id) VALUES ('stock_items', old.item_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS sales_orders_log_ai AFTER INSERT ON sales_orders BEGIN
+  INSERT INTO change_log(table_name, row_id) VALUES ('sales_orders', new.order_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS sales_orders_log_au AFTER UPDATE ON sales_orders BEGIN
+  INSERT INTO change_log(table_name, row_id) VALUES ('sales_orders', new.order_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS sales_orders_log_ad AFTER DELETE ON sales_orders BEGIN
+  INSERT INTO change_log(table_name, row_id) VALUES ('sales_orders', old.order_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS sales_order_rows_log_ai AFTER INSERT ON sales_order_rows BEGIN
+  INSERT INTO change_log(table_name, row_id) VALUES ('sales_order_rows', new.order_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS sales_order_rows_log_au AFTER UPDATE ON sales_order_rows BEGIN
+  INSERT INTO change_log(table_name, row_id) VALUES ('sales_order_rows', new.order_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS sales_order_rows_log_ad AFTER DELETE ON sales_order_rows BEGIN
+  INSERT INTO change_log(table_name, row_id) VALUES ('sales_order_rows', old.order_id);
+END;
@@ -0,0 +1,1900 @@
+import argparse
+import bisect
+import csv
+import datetime as dt
+import gzip
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+
+ROOT = Path(__file__).resolve().parent
+DB_FILE = ROOT / "urban_gear.db"
+SCHEMA_FILE = ROOT / "schema.sql"
+IMG_DIR = ROOT / "item_images"
+RES_DIR = ROOT / "resources"
+PLACEHOLDER = RES_DIR / "placeholder.png"
+THUMB_SIZE = (46, 46)
+PREVIEW_SIZE = (300, 200)
+IMAGE_QUALITY = 85
+PAGE_SIZE = 100
+PICKER_LIMIT = 20
+PICKER_CACHE = 128
+ORDERS_PAGE_SIZE = 200
+HIGH_PROMO = 15
+SNAPSHOT_PATCH_LIMIT = 1000
+MAX_PAGES = 20
+IMPORT_BATCH = 5000
+EXPORT_FETCH = 1000
+SLOW_QUERY_MS = 50.0
+SLOW_LOG = ROOT / "slow_queries.log"
+CHANGE_BATCH = 500
+CHANGE_LOG_KEEP = 100_000
+WRITE_RETRIES = 6
+WRITE_BACKOFF = 0.05
+
+def digest(raw: str) -> str:
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class QueryTracer:
+    def __init__(self, slow_ms: float = SLOW_QUERY_MS, log_path: Path = SLOW_LOG) -> None:
+        self.enabled = False
+        self.slow_ms = slow_ms
+        self.log_path = log_path
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.stats: dict[tuple[str, str], dict] = {}
+        self.traced: dict[str, int] = {}
+
+    def enable(self, slow_ms: float | None = None, log_path: Path | None = None) -> None:
+        self.enabled = True
+        self.slow_ms = self.slow_ms if slow_ms is None else slow_ms
+        self.log_path = log_path or self.log_path
+        with connections.lock:
+            for con in connections.conns.values():
+                con.set_trace_callback(self.on_statement)
+
+    @contextmanager
+    def scope(self, label: str):
+        previous = getattr(self.local, "label", None)
+        self.local.label = label
+        try:
+            yield
+        finally:
+            self.local.label = previous
+
+    def caller(self) -> str:
+        name = lambda frame: getattr(frame.f_code, "co_qualname", frame.f_code.co_name)
+        frame = sys._getframe(2)
+        while frame.f_back is not None and frame.f_code.co_filename == __file__ and name(frame).startswith("TrackedConnection."):
+            frame = frame.f_back
+        api = name(frame)
+        screen = getattr(self.local, "label", None)
+        while screen is None and frame is not None:
+            if frame.f_code.co_filename != __file__ and Path(frame.f_code.co_filename).parent == ROOT:
+                screen = name(frame)
+            frame = frame.f_back
+        return api if screen in (None, api) else f"{screen} > {api}"
+
+    def on_statement(self, sql: str) -> None:
+        text = " ".join(sql.split())[:300]
+        with self.lock:
+            self.traced[text] = self.traced.get(text, 0) + 1
+
+    def record(self, con: sqlite3.Connection, sql: str, params, elapsed_ms: float, many: bool = False) -> tuple[str, str]:
+        key = (" ".join(sql.split())[:300], self.caller())
+        with self.lock:
+            entry = self.stats.get(key)
+            if entry is None:
+                entry = self.stats[key] = {"count": 0, "total_ms": 0.0, "rows": 0, "samples": deque(maxlen=2048)}
+            entry["count"] += 1
+            entry["total_ms"] += elapsed_ms
+            entry["samples"].append(elapsed_ms)
+        if elapsed_ms >= self.slow_ms:
+            self.log_slow(con, sql, None if many else params, elapsed_ms, key[1])
+        return key
+
+    def add_rows(self, key: tuple[str, str], rows: int) -> None:
+        with self.lock:
+            self.stats[key]["rows"] += rows
+
+    def log_slow(self, con: sqlite3.Connection, sql: str, params, elapsed_ms: float, caller: str) -> None:
+        plan = []
+        if params is not None and sql.lstrip()[:6].upper() in ("SELECT", "WITH S", "UPDATE", "DELETE", "INSERT"):
+            try:
+                plan = [row[3] for row in sqlite3.Connection.execute(con, "EXPLAIN QUERY PLAN " + sql, params)]
+            except sqlite3.Error as ex:
+                plan = [f"план недоступен: {ex}"]
+        lines = [f"{dt.datetime.now().isoformat(timespec='milliseconds')} {elapsed_ms:.1f} ms {caller}", " ".join(sql.split())]
+        if params:
+            lines.append(f"params: {params!r}"[:500])
+        lines.extend(f"  {line}" for line in plan)
+        with self.lock, self.log_path.open("a", encoding="utf-8") as fh:
+            fh.write("\n".join(lines) + "\n\n")
+
+    def report(self) -> list[dict]:
+        with self.lock:
+            rows = []
+            for (sql, caller), entry in self.stats.items():
+                samples = sorted(entry["samples"])
+                rows.append({
+                    "sql": sql,
+                    "caller": caller,
+                    "count": entry["count"],
+                    "total_ms": round(entry["total_ms"], 3),
+                    "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+                    "rows": entry["rows"],
+                })
+        return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+    def print_report(self, limit: int = 20) -> None:
+        print(f"{'всего, мс':>10} {'p95, мс':>9} {'вызовов':>8} {'строк':>9}  источник / запрос")
+        for row in self.report()[:limit]:
+            print(f"{row['total_ms']:10.1f} {row['p95_ms']:9.2f} {row['count']:8} {row['rows']:9}  {row['caller']}: {row['sql'][:120]}")
+        with self.lock:
+            triggered = sum(count for text, count in self.traced.items() if text.startswith("-- TRIGGER"))
+        print(f"Выполнено SQLite: {sum(self.traced.values())}, из них в триггерах: {triggered}")
+        print(f"{'соединение':<24} {'открыто':>8} {'запросов':>9} {'изменено':>9} {'повторов':>9}")
+        for name, counts in connections.counters().items():
+            print(f"{name:<24} {counts['opened']:8} {counts['statements']:9} {counts['changes']:9} {counts['retries']:9}")
+
+
+class TracedCursor(sqlite3.Cursor):
+    key: tuple[str, str] | None = None
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None and self.key:
+            tracer.add_rows(self.key, 1)
+        return row
+
+    def fetchmany(self, size: int = 1):
+        rows = super().fetchmany(size)
+        if self.key:
+            tracer.add_rows(self.key, len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        if self.key:
+            tracer.add_rows(self.key, len(rows))
+        return rows
+
+    def __next__(self):
+        row = super().__next__()
+        if self.key:
+            tracer.add_rows(self.key, 1)
+        return row
+
+
+class TrackedConnection(sqlite3.Connection):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.statements = 0
+
+    def execute(self, sql: str, params=(), /) -> sqlite3.Cursor:
+        self.statements += 1
+        if not tracer.enabled:
+            return super().execute(sql, params)
+        cursor = self.cursor(TracedCursor)
+        started = time.perf_counter()
+        cursor.execute(sql, params)
+        cursor.key = tracer.record(self, sql, params, (time.perf_counter() - started) * 1000)
+        return cursor
+
+    def executemany(self, sql: str, params, /) -> sqlite3.Cursor:
+        self.statements += 1
+        if not tracer.enabled:
+            return super().executemany(sql, params)
+        started = time.perf_counter()
+        cursor = super().executemany(sql, params)
+        tracer.record(self, sql, params, (time.perf_counter() - started) * 1000, many=True)
+        return cursor
+
+    def executescript(self, script: str, /) -> sqlite3.Cursor:
+        self.statements += 1
+        if not tracer.enabled:
+            return super().executescript(script)
+        started = time.perf_counter()
+        cursor = super().executescript(script)
+        tracer.record(self, script, None, (time.perf_counter() - started) * 1000, many=True)
+        return cursor
+
+
+class ConnectionManager:
+    PRAGMAS = (
+        "PRAGMA foreign_keys = ON",
+        "PRAGMA busy_timeout = 5000",
+        "PRAGMA synchronous = NORMAL",
+        "PRAGMA cache_size = -16000",
+        "PRAGMA mmap_size = 268435456",
+        "PRAGMA temp_store = MEMORY",
+    )
+
+    def __init__(self, path: Path, cached_statements: int = 512) -> None:
+        self.path = path
+        self.cached_statements = cached_statements
+        self.lock = threading.RLock()
+        self.write_lock = threading.RLock()
+        self.conns: dict[str, TrackedConnection] = {}
+        self.opened = {"reader": 0, "writer": 0}
+        self.retries = 0
+
+    def connect(self, name: str) -> TrackedConnection:
+        con = self.conns.get(name)
+        if con is not None:
+            return con
+        con = sqlite3.connect(
+            self.path,
+            factory=TrackedConnection,
+            cached_statements=self.cached_statements,
+            check_same_thread=False,
+        )
+        con.row_factory = sqlite3.Row
+        if tracer.enabled:
+            con.set_trace_callback(tracer.on_statement)
+        con.execute("PRAGMA journal_mode = WAL")
+        for pragma in self.PRAGMAS:
+            con.execute(pragma)
+        if name.startswith("reader"):
+            con.execute("PRAGMA query_only = ON")
+        self.conns[name] = con
+        self.opened[name] = self.opened.get(name, 0) + 1
+        return con
+
+    def read(self) -> TrackedConnection:
+        thread = threading.current_thread()
+        name = "reader" if thread is threading.main_thread() else f"reader:{thread.name}"
+        with self.lock:
+            return self.connect(name)
+
+    @contextmanager
+    def write(self):
+        with self.write_lock:
+            with self.lock:
+                con = self.connect("writer")
+            for attempt in range(WRITE_RETRIES + 1):
+                try:
+                    con.execute("BEGIN IMMEDIATE")
+                    break
+                except sqlite3.OperationalError as ex:
+                    if attempt == WRITE_RETRIES or ex.sqlite_errorcode & 0xFF not in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED):
+                        raise
+                    self.retries += 1
+                    time.sleep(WRITE_BACKOFF * 2**attempt * random.uniform(0.5, 1.5))
+            try:
+                yield con
+                con.commit()
+            except BaseException:
+                con.rollback()
+                raise
+
+    def counters(self) -> dict[str, dict[str, int]]:
+        return {
+            name: {
+                "opened": self.opened[name],
+                "statements": self.conns[name].statements if name in self.conns else 0,
+                "changes": self.conns[name].total_changes if name in self.conns else 0,
+                "retries": self.retries if name == "writer" else 0,
+            }
+            for name in self.opened
+        }
+
+    def close(self) -> None:
+        with self.lock:
+            if "writer" in self.conns:
+                try:
+                    self.conns["writer"].execute("PRAGMA optimize")
+                except sqlite3.OperationalError:
+                    pass
+            for con in self.conns.values():
+                con.close()
+            self.conns.clear()
+
+
+connections = ConnectionManager(DB_FILE)
+tracer = QueryTracer()
+
+
+def open_database(path: str | Path) -> ConnectionManager:
+    global connections
+    connections.close()
+    connections = ConnectionManager(Path(path))
+    refs.invalidate()
+    changes.reset()
+    return connections
+
+
+REF_TABLES = {
+    "group": ("groups", "group_id", "title", "title"),
+    "maker": ("makers", "maker_id", "title", "title"),
+    "vendor": ("vendors", "vendor_id", "title", "title"),
+    "measure": ("measures", "measure_id", "title", "title"),
+    "state": ("order_states", "state_id", "title", "state_id"),
+    "location": ("pickup_locations", "location_id", "address", "location_id"),
+}
+
+
+def prune_changes(con: sqlite3.Connection) -> None:
+    con.execute("DELETE FROM change_log WHERE change_id <= (SELECT MAX(change_id) FROM change_log) - ?", (CHANGE_LOG_KEEP,))
+
+
+class ChangeFeed:
+    def __init__(self) -> None:
+        self.version = None
+        self.last_id = None
+
+    def reset(self) -> None:
+        self.version = self.last_id = None
+
+    def poll(self) -> dict[str, set[int]] | None:
+        with connections.lock:
+            con = connections.connect("watcher")
+        version = con.execute("PRAGMA data_version").fetchone()[0]
+        if version == self.version:
+            return {}
+        self.version = version
+        refs.invalidate()
+        row = con.execute("SELECT seq FROM sqlite_sequence WHERE name='change_log'").fetchone()
+        high = row[0] if row else 0
+        last_id, self.last_id = self.last_id, high
+        if last_id is None or high <= last_id:
+            return {}
+        low = con.execute("SELECT MIN(change_id) FROM change_log").fetchone()[0]
+        if low is None or low > last_id + 1 or high - last_id > CHANGE_BATCH:
+            return None
+        found = {}
+        for table, row_id in con.execute("SELECT table_name, row_id FROM change_log WHERE change_id > ? AND change_id <= ?", (last_id, high)):
+            found.setdefault(table, set()).add(row_id)
+        return found
+
+
+class RefCache:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.tables: dict[str, tuple[dict[str, int], dict[int, str]]] = {}
+        self.generation = 0
+
+    def load(self, kind: str) -> tuple[dict[str, int], dict[int, str]]:
+        with self.lock:
+            cached = self.tables.get(kind)
+            generation = self.generation
+        if cached is not None:
+            return cached
+        table, id_col, title_col, order_col = REF_TABLES[kind]
+        rows = connections.read().execute(f"SELECT {id_col}, {title_col} FROM {table} ORDER BY {order_col}").fetchall()
+        cached = ({row[1]: row[0] for row in rows}, {row[0]: row[1] for row in rows})
+        with self.lock:
+            if generation == self.generation:
+                self.tables[kind] = cached
+        return cached
+
+    def ids(self, kind: str) -> dict[str, int]:
+        return self.load(kind)[0]
+
+    def titles(self, kind: str) -> dict[int, str]:
+        return self.load(kind)[1]
+
+    def invalidate(self, *kinds: str) -> None:
+        with self.lock:
+            for kind in kinds or list(self.tables):
+                self.tables.pop(kind, None)
+            self.generation += 1
+
+
+refs = RefCache()
+changes = ChangeFeed()
+
+
+def prefix_range(text: str) -> list[str]:
+    return [text, text[:-1] + chr(ord(text[-1]) + 1)]
+
+
+def fts_query(text: str) -> str:
+    tokens = re.findall(r"\w[\w-]*", text.lower())
+    return " ".join('"' + token.replace('"', '""') + '"*' for token in tokens)
+
+
+def prepare_placeholder() -> None:
+    RES_DIR.mkdir(exist_ok=True)
+    if PLACEHOLDER.exists():
+        return
+    from PIL import Image, ImageDraw
+
+    img = Image.new("RGB", (300, 200), (245, 245, 245))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((8, 8, 292, 192), outline=(70, 70, 70), width=3)
+    draw.text((95, 90), "URBAN GEAR", fill=(40, 40, 40))
+    img.save(PLACEHOLDER)
+
+
+CATALOG_COLUMNS = (
+    "si.item_id, si.sku, si.item_name, g.title group_title, si.about, mk.title maker_title, vd.title vendor_title, "
+    "si.base_price, si.promo, si.final_price, si.qty, si.photo_path, si.thumb_path"
+)
+CATALOG_TABLES = (
+    "stock_items si "
+    "JOIN groups g ON g.group_id=si.group_id "
+    "JOIN makers mk ON mk.maker_id=si.maker_id "
+    "JOIN vendors vd ON vd.vendor_id=si.vendor_id"
+)
+ORDERS_COLUMNS = (
+    "so.order_id, so.order_code, so.customer_name, st.title state_title, pl.address, "
+    "so.created_on, so.issued_on, so.total_sum, so.item_count"
+)
+ORDERS_TABLES = (
+    "sales_orders so "
+    "JOIN order_states st ON st.state_id = so.state_id "
+    "JOIN pickup_locations pl ON pl.location_id = so.location_id"
+)
+ORDERS_KEYS = ["so.created_on", "so.order_id"]
+
+
+ADDED_COLUMNS = {
+    "sales_orders": [("total_sum", "REAL NOT NULL DEFAULT 0"), ("item_count", "INTEGER NOT NULL DEFAULT 0")],
+    "sales_order_rows": [("reserved", "INTEGER NOT NULL DEFAULT 0")],
+    "stock_items": [
+        ("thumb_path", "TEXT"),
+        ("row_version", "INTEGER NOT NULL DEFAULT 0"),
+        ("final_price", "REAL GENERATED ALWAYS AS (ROUND(base_price * (1 - promo / 100.0), 2)) VIRTUAL"),
+    ],
+}
+
+
+def add_missing_columns(con: sqlite3.Connection) -> set[str]:
+    added = set()
+    for table, columns in ADDED_COLUMNS.items():
+        existing = {row["name"] for row in con.execute(f"PRAGMA table_xinfo({table})")}
+        if not existing:
+            continue
+        for name, ddl in columns:
+            if name not in existing:
+                con.execute(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}")
+                added.add(f"{table}.{name}")
+    return added
+
+
+def schema_statements() -> list[str]:
+    statements, buffer = [], ""
+    for line in SCHEMA_FILE.read_text(encoding="utf-8").splitlines(keepends=True):
+        buffer += line
+        if sqlite3.complete_statement(buffer):
+            statements.append(buffer.strip())
+            buffer = ""
+    return statements
+
+
+def apply_schema(con: sqlite3.Connection) -> None:
+    for statement in schema_statements():
+        con.execute(statement)
+
+
+CATALOG_FTS_SQL = """
+INSERT INTO catalog_fts(rowid, sku, item_name, group_title, about, maker_title, vendor_title)
+SELECT si.item_id, si.sku, si.item_name, g.title, si.about, mk.title, vd.title
+FROM stock_items si
+JOIN groups g ON g.group_id=si.group_id
+JOIN makers mk ON mk.maker_id=si.maker_id
+JOIN vendors vd ON vd.vendor_id=si.vendor_id
+"""
+
+
+def migrate_baseline(con: sqlite3.Connection) -> None:
+    added = add_missing_columns(con)
+    rollups = con.execute("SELECT 1 FROM sqlite_master WHERE name='sales_daily'").fetchone()
+    apply_schema(con)
+    con.execute("DELETE FROM catalog_fts")
+    con.execute(CATALOG_FTS_SQL)
+    if "sales_orders.total_sum" in added:
+        con.execute(
+            """
+            UPDATE sales_orders SET
+              total_sum = (SELECT ROUND(COALESCE(SUM(qty * unit_price), 0), 2) FROM sales_order_rows WHERE order_id = sales_orders.order_id),
+              item_count = (SELECT COALESCE(SUM(qty), 0) FROM sales_order_rows WHERE order_id = sales_orders.order_id)
+            """
+        )
+    if not rollups:
+        rebuild_rollups(con)
+
+
+def migrate_final_price(con: sqlite3.Connection) -> None:
+    add_missing_columns(con)
+    apply_schema(con)
+
+
+def migrate_reserved_rows(con: sqlite3.Connection) -> None:
+    add_missing_columns(con)
+
+
+def migrate_order_search(con: sqlite3.Connection) -> None:
+    apply_schema(con)
+    con.execute("DELETE FROM orders_fts")
+    con.execute("INSERT INTO orders_fts(rowid, order_code, customer_name) SELECT order_id, order_code, customer_name FROM sales_orders")
+
+
+def migrate_fts_pause(con: sqlite3.Connection) -> None:
+    con.execute("DROP TRIGGER IF EXISTS stock_items_fts_ai")
+    con.execute("DROP TRIGGER IF EXISTS stock_items_fts_au")
+    apply_schema(con)
+
+
+MIGRATIONS = [migrate_baseline, migrate_final_price, migrate_reserved_rows, migrate_order_search, migrate_fts_pause]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def schema_version(con: sqlite3.Connection) -> int:
+    return con.execute("PRAGMA user_version").fetchone()[0]
+
+
+def setup_database() -> bool:
+    if schema_version(connections.read()) >= SCHEMA_VERSION:
+        return False
+    with connections.write() as con:
+        version = schema_version(con)
+        for migrate in MIGRATIONS[version:]:
+            migrate(con)
+        con.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    refs.invalidate()
+    item_search.invalidate()
+    return True
+
+
+def seed_database() -> None:
+    setup_database()
+    prepare_placeholder()
+    with connections.write() as con:
+        con.executemany(
+            "INSERT OR IGNORE INTO accounts(username, pass_hash, fio, role_code) VALUES (?, ?, ?, ?)",
+            [
+                ("root", digest("root123"), "Орлова Мария Николаевна", "admin"),
+                ("boss", digest("boss123"), "Романов Денис Игоревич", "manager"),
+                ("buyer", digest("buyer123"), "Кузнецова Ирина Павловна", "client"),
+            ],
+        )
+
+        for table, col, values in [
+            ("vendors", "title", ["Север Логистик", "Prime Supply", "City Stock"]),
+            ("makers", "title", ["Urban", "Altitude", "Core"]),
+            ("groups", "title", ["Куртки", "Рюкзаки", "Кроссовки"]),
+            ("measures", "title", ["шт."]),
+            ("order_states", "title", ["Новый", "Собирается", "Выдан"]),
+            (
+                "pickup_locations",
+                "address",
+                ["г. Москва, ул. Ленина, 10", "г. Казань, ул. Баумана, 5"],
+            ),
+        ]:
+            con.executemany(
+                f"INSERT OR IGNORE INTO {table}({col}) VALUES (?)",
+                [(v,) for v in values],
+            )
+
+        con.executemany(
+            """
+            INSERT OR IGNORE INTO stock_items(sku, item_name, group_id, about, maker_id, vendor_id, base_price, measure_id, qty, promo, photo_path)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                ("UG-A101", "Куртка Storm", 1, "Ветрозащитная куртка", 1, 1, 7990, 1, 5, 10, str(PLACEHOLDER)),
+                ("UG-A115", "Куртка Polar", 1, "Зимняя куртка", 2, 1, 9990, 1, 3, 7, str(PLACEHOLDER)),
+                ("UG-A140", "Куртка City", 1, "Легкая городская куртка", 3, 2, 6490, 1, 12, 0, str(PLACEHOLDER)),
+                ("UG-B210", "Рюкзак Metro", 2, "Городской рюкзак 20л", 2, 2, 3990, 1, 0, 18, str(PLACEHOLDER)),
+                ("UG-B240", "Рюкзак Trail", 2, "Треккинговый рюкзак 35л", 1, 3, 6590, 1, 6, 12, str(PLACEHOLDER)),
+                ("UG-B290", "Сумка Sling", 2, "Компактная сумка через плечо", 3, 1, 2790, 1, 14, 0, str(PLACEHOLDER)),
+                ("UG-C330", "Кроссовки Dash", 3, "Повседневные кроссовки", 3, 3, 5990, 1, 8, 5, str(PLACEHOLDER)),
+                ("UG-C350", "Кроссовки Sprint", 3, "Беговая модель", 2, 2, 7290, 1, 4, 16, str(PLACEHOLDER)),
+                ("UG-C390", "Кеды Street", 3, "Классические кеды", 1, 1, 4890, 1, 9, 0, str(PLACEHOLDER)),
+                ("UG-C420", "Кроссовки Aero", 3, "Легкие кроссовки", 2, 3, 8190, 1, 2, 20, str(PLACEHOLDER)),
+            ],
+        )
+
+        count_orders = con.execute("SELECT COUNT(*) c FROM sales_orders").fetchone()["c"]
+        if count_orders == 0:
+            state_map = {
+                row["title"]: row["state_id"]
+                for row in con.execute("SELECT state_id, title FROM order_states").fetchall()
+            }
+            location_map = {
+                row["address"]: row["location_id"]
+                for row in con.execute("SELECT location_id, address FROM pickup_locations").fetchall()
+            }
+
+            con.executemany(
+                """
+                INSERT INTO sales_orders(order_code, customer_name, state_id, location_id, created_on, issued_on)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    ("SO-2026-001", "Климова Елена", state_map["Новый"], location_map["г. Москва, ул. Ленина, 10"], "2026-02-20", "2026-02-23"),
+                    ("SO-2026-002", "Астахов Иван", state_map["Собирается"], location_map["г. Казань, ул. Баумана, 5"], "2026-02-21", "2026-02-24"),
+                    ("SO-2026-003", "Воробьева Марина", state_map["Выдан"], location_map["г. Москва, ул. Ленина, 10"], "2026-02-18", "2026-02-22"),
+                ],
+            )
+
+            item_map = {
+                row["sku"]: row["item_id"]
+                for row in con.execute("SELECT item_id, sku FROM stock_items").fetchall()
+            }
+            order_map = {
+                row["order_code"]: row["order_id"]
+                for row in con.execute("SELECT order_id, order_code FROM sales_orders").fetchall()
+            }
+
+            con.executemany(
+                """
+                INSERT INTO sales_order_rows(order_id, item_id, qty, unit_price)
+                VALUES (?, ?, ?, ?)
+                """,
+                [
+                    (order_map["SO-2026-001"], item_map["UG-A101"], 1, 7990),
+                    (order_map["SO-2026-001"], item_map["UG-B240"], 1, 6590),
+                    (order_map["SO-2026-002"], item_map["UG-C350"], 2, 7290),
+                    (order_map["SO-2026-002"], item_map["UG-B290"], 1, 2790),
+                    (order_map["SO-2026-003"], item_map["UG-C390"], 1, 4890),
+                ],
+            )
+    refs.invalidate()
+    item_search.invalidate()
+
+
+def hot_queries() -> list[tuple[str, str, list, str]]:
+    def page(where: list[str], params: list, keys: list[str], desc: bool = False) -> tuple[str, list]:
+        pager = KeysetPager(CATALOG_COLUMNS, CATALOG_TABLES, where, params, keys, desc)
+        pager.bounds[0] = (0,) * len(keys)
+        return pager.sql(1)
+
+    def orders(where: list[str], params: list) -> tuple[str, list]:
+        pager = KeysetPager(ORDERS_COLUMNS, ORDERS_TABLES, where, params, ORDERS_KEYS, True)
+        pager.bounds[0] = ("9999-12-31", 0)
+        return pager.sql(1)
+
+    def search(query: OrderQuery, bound: tuple = ("9999-12-31", 0)) -> tuple[str, list]:
+        pager = orders_pager(query)
+        pager.bounds[0] = bound
+        return pager.sql(1)
+
+    return [
+        ("catalog: vendor filter", *page(["si.vendor_id = ?"], [1], ["si.item_id"]), r"INDEX idx_stock_items_vendor\b"),
+        ("catalog: qty asc", *page([], [], ["si.qty", "si.item_id"]), r"INDEX idx_stock_items_qty\b"),
+        ("catalog: qty desc", *page([], [], ["si.qty", "si.item_id"], True), r"INDEX idx_stock_items_qty\b"),
+        ("catalog: vendor + qty", *page(["si.vendor_id = ?"], [1], ["si.qty", "si.item_id"]), r"INDEX idx_stock_items_vendor_qty\b"),
+        ("catalog: price", *page([], [], ["si.final_price", "si.item_id"]), r"INDEX idx_stock_items_final_price\b"),
+        ("catalog: price range", *page(["si.final_price >= ?", "si.final_price <= ?"], [100, 5000], ["si.final_price", "si.item_id"], True), r"INDEX idx_stock_items_final_price\b"),
+        ("catalog: vendor + price", *page(["si.vendor_id = ?"], [1], ["si.final_price", "si.item_id"]), r"INDEX idx_stock_items_vendor_final_price\b"),
+        ("catalog: promo desc", *page([], [], ["si.promo", "si.item_id"], True), r"INDEX idx_stock_items_promo\b"),
+        ("catalog: vendor + promo", *page(["si.vendor_id = ?"], [1], ["si.promo", "si.item_id"], True), r"INDEX idx_stock_items_vendor_promo\b"),
+        ("catalog: name", *page([], [], ["si.item_name", "si.item_id"]), r"INDEX idx_stock_items_name\b"),
+        ("catalog: vendor + name", *page(["si.vendor_id = ?"], [1], ["si.item_name", "si.item_id"]), r"INDEX idx_stock_items_vendor_name\b"),
+        ("catalog counts: out of stock", "SELECT COUNT(*) FROM stock_items si WHERE si.qty = 0", [], r"INDEX idx_stock_items_qty\b"),
+        ("catalog counts: high promo", f"SELECT COUNT(*) FROM stock_items si WHERE si.promo > {HIGH_PROMO}", [], r"INDEX idx_stock_items_promo\b"),
+        ("catalog counts: vendor + high promo", f"SELECT COUNT(*) FROM stock_items si WHERE si.vendor_id = ? AND si.promo > {HIGH_PROMO}", [1], r"INDEX idx_stock_items_vendor_promo\b"),
+        ("catalog counts: price range", "SELECT COUNT(*) FROM stock_items si WHERE si.final_price >= ? AND si.final_price <= ?", [100, 5000], r"INDEX idx_stock_items_final_price\b"),
+        ("orders: page", *orders([], []), r"INDEX idx_sales_orders_created\b"),
+        ("orders: state", *orders(["so.state_id = ?"], [1]), r"INDEX idx_sales_orders_state_created\b"),
+        ("orders: location", *orders(["so.location_id = ?"], [1]), r"INDEX idx_sales_orders_location_created\b"),
+        ("orders: created range", *orders(["so.created_on >= ?", "so.created_on <= ?"], ["2026-01-01", "2026-02-01"]), r"INDEX idx_sales_orders_created\b"),
+        ("orders: state + created range", *orders(["so.state_id = ?", "so.created_on >= ?"], [1, "2026-01-01"]), r"INDEX idx_sales_orders_state_created\b"),
+        ("orders: issued range", *search(OrderQuery(date_field="issued_on", date_from="2026-01-01", date_to="2026-02-01")), r"INDEX idx_sales_orders_issued\b"),
+        ("orders: state + issued", *search(OrderQuery(state_id=1, date_field="issued_on")), r"INDEX idx_sales_orders_state_issued\b"),
+        ("orders: location + issued", *search(OrderQuery(location_id=1, date_field="issued_on")), r"INDEX idx_sales_orders_location_issued\b"),
+        ("orders: code / customer", *search(OrderQuery(text="клим"), (1 << 62,)), r"SCAN orders_fts VIRTUAL TABLE"),
+        ("orders: state + code / customer", *search(OrderQuery(state_id=1, text="so-2026"), (1 << 62,)), r"SCAN orders_fts VIRTUAL TABLE"),
+        ("orders: total trigger", "UPDATE sales_orders SET total_sum = total_sum + ? WHERE order_id = ?", [1, 1], r"SEARCH sales_orders USING INTEGER PRIMARY KEY"),
+        ("order form: rows", "SELECT sor.row_id, sor.qty FROM sales_order_rows sor WHERE sor.order_id=?", [1], r"INDEX idx_sales_order_rows_order\b"),
+        ("delete item: usage", "SELECT 1 FROM sales_order_rows WHERE item_id=? LIMIT 1", [1], r"INDEX idx_sales_order_rows_item\b"),
+        ("cascade: order rows", "SELECT 1 FROM sales_order_rows WHERE order_id=?", [1], r"INDEX idx_sales_order_rows_order\b"),
+        ("export: orders", EXPORT_SQL["orders"], [], r"SCAN so\b"),
+        ("picker: sku prefix", PICKER_SKU_SQL, ["UG", "UH", 20], r"INDEX sqlite_autoindex_stock_items_1\b"),
+        ("fts: group title", "SELECT item_id FROM stock_items WHERE group_id = ?", [1], r"INDEX idx_stock_items_group\b"),
+        ("fts: maker title", "SELECT item_id FROM stock_items WHERE maker_id = ?", [1], r"INDEX idx_stock_items_maker\b"),
+        ("fts: vendor title", "SELECT item_id FROM stock_items WHERE vendor_id = ?", [1], r"INDEX idx_stock_items_vendor(_\w+)?\b"),
+        ("fk: measures", "SELECT 1 FROM stock_items WHERE measure_id=?", [1], r"INDEX idx_stock_items_measure\b"),
+        ("fk: order states", "SELECT 1 FROM sales_orders WHERE state_id=?", [1], r"INDEX idx_sales_orders_state_(created|issued)\b"),
+        ("fk: pickup locations", "SELECT 1 FROM sales_orders WHERE location_id=?", [1], r"INDEX idx_sales_orders_location_(created|issued)\b"),
+        ("rollup: daily upsert", "SELECT qty FROM sales_daily WHERE day=? AND item_id=? AND location_id=?", ["2026-01-01", 1, 1], r"PRIMARY KEY \(day=\? AND item_id=\? AND location_id=\?\)"),
+        ("analytics: totals", "SELECT SUM(revenue) FROM sales_totals WHERE day BETWEEN ? AND ?", ["2026-01-01", "2026-01-31"], r"SEARCH sales_totals USING PRIMARY KEY \(day>\? AND day<\?\)"),
+    ]
+
+
+def check_query_plans(con: sqlite3.Connection | None = None) -> list[tuple[str, bool, list[str]]]:
+    if con is None:
+        con = sqlite3.connect(":memory:")
+        con.executescript(SCHEMA_FILE.read_text(encoding="utf-8"))
+    report = []
+    for name, sql, params, pattern in hot_queries():
+        plan = [row[3] for row in con.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        ok = any(re.search(pattern, line) for line in plan) and not any("TEMP B-TREE" in line for line in plan)
+        report.append((name, ok, plan))
+    return report
+
+
+def print_query_plans() -> bool:
+    report = check_query_plans()
+    for name, ok, plan in report:
+        print(f"{'OK  ' if ok else 'FAIL'} {name}")
+        for line in plan:
+            print(f"       {line}")
+    return all(ok for _, ok, _ in report)
+
+
+def fit_image(img: "Image.Image", size: tuple[int, int]) -> "Image.Image":
+    from PIL import Image
+
+    img = img.copy()
+    img.thumbnail(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+    canvas = Image.new("RGB", size, (255, 255, 255))
+    canvas.paste(img, ((size[0] - img.width) // 2, (size[1] - img.height) // 2))
+    return canvas
+
+
+def ingest_item_image(path: str, stem: str | None = None) -> dict[str, str]:
+    IMG_DIR.mkdir(exist_ok=True)
+    from PIL import Image
+
+    stem = stem or f"item_{dt.datetime.now().strftime('%Y%m%d%H%M%S%f')}"
+    with Image.open(path) as raw:
+        raw.draft("RGB", (PREVIEW_SIZE[0] * 2, PREVIEW_SIZE[1] * 2))
+        img = raw.convert("RGB")
+    out = {}
+    for key, size, suffix in (("photo_path", PREVIEW_SIZE, ""), ("thumb_path", THUMB_SIZE, "_thumb")):
+        target = IMG_DIR / f"{stem}{suffix}.jpg"
+        fit_image(img, size).save(target, "JPEG", quality=IMAGE_QUALITY, optimize=True)
+        out[key] = str(target)
+    return out
+
+
+def discard_item_images(*paths: str | None) -> None:
+    for raw in paths:
+        if not raw:
+            continue
+        path = Path(raw)
+        if path.parent == IMG_DIR:
+            path.unlink(missing_ok=True)
+
+
+IMPORT_UPSERT_SQL = """
+INSERT INTO stock_items(sku, item_name, group_id, about, maker_id, vendor_id, base_price, measure_id, qty, promo, photo_path, thumb_path)
+VALUES (:sku, :item_name, :group_id, :about, :maker_id, :vendor_id, :base_price, :measure_id, :qty, :promo, :photo_path, :thumb_path)
+ON CONFLICT(sku) DO UPDATE SET
+  item_name=excluded.item_name, group_id=excluded.group_id, about=excluded.about, maker_id=excluded.maker_id,
+  vendor_id=excluded.vendor_id, base_price=excluded.base_price, measure_id=excluded.measure_id, qty=excluded.qty,
+  promo=excluded.promo, photo_path=COALESCE(excluded.photo_path, photo_path), thumb_path=COALESCE(excluded.thumb_path, thumb_path),
+  row_version=row_version + 1
+"""
+IMPORT_REFS = {
+    "group": ("groups", "group_id"),
+    "maker": ("makers", "maker_id"),
+    "vendor": ("vendors", "vendor_id"),
+    "measure": ("measures", "measure_id"),
+}
+
+
+def read_feed(path: Path):
+    if path.suffix.lower() in (".jsonl", ".ndjson"):
+        with path.open(encoding="utf-8") as fh:
+            for line_no, line in enumerate(fh, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_no, json.loads(line)
+                except json.JSONDecodeError:
+                    yield line_no, line.strip()
+    else:
+        with path.open(encoding="utf-8-sig", newline="") as fh:
+            reader = csv.DictReader(fh)
+            for record in reader:
+                yield reader.line_num, record
+
+
+def parse_feed_record(record: dict, base: Path) -> dict:
+    if not isinstance(record, dict):
+        raise ValueError("строка не является объектом JSON")
+    get = lambda key: str(record.get(key) or "").strip()
+    item = {"sku": get("sku"), "item_name": get("item_name"), "about": get("about")}
+    for key in ("sku", "item_name", *IMPORT_REFS):
+        if not get(key):
+            raise ValueError(f"не заполнено поле {key}")
+    item.update({key: get(key) for key in IMPORT_REFS})
+    try:
+        item["base_price"] = float(get("base_price").replace(",", "."))
+        item["qty"] = int(get("qty") or 0)
+        item["promo"] = float((get("promo") or "0").replace(",", "."))
+    except ValueError:
+        raise ValueError("неверный формат числа") from None
+    if item["base_price"] < 0 or item["qty"] < 0 or not 0 <= item["promo"] <= 100:
+        raise ValueError("число вне допустимого диапазона")
+    photo = get("photo")
+    item["photo"] = str(base / photo) if photo else None
+    item["photo_path"] = item["thumb_path"] = None
+    return item
+
+
+def import_photo(item: dict) -> dict:
+    item.update(ingest_item_image(item["photo"], f"item_{digest(item['sku'])[:20]}"))
+    return item
+
+
+def resolve_refs(con: sqlite3.Connection, known: dict[str, dict[str, int]], items: list[dict]) -> set[str]:
+    created = set()
+    for key, (table, id_col) in IMPORT_REFS.items():
+        ids = known[key]
+        for item in items:
+            title = item[key]
+            if title not in ids:
+                ids[title] = con.execute(f"INSERT INTO {table}(title) VALUES (?)", (title,)).lastrowid
+                created.add(key)
+            item[id_col] = ids[title]
+    return created
+
+
+def refresh_catalog_fts(con: sqlite3.Connection, skus: list[str]) -> None:
+    ids = "SELECT item_id FROM stock_items WHERE sku IN (SELECT value FROM json_each(?))"
+    payload = json.dumps(skus, ensure_ascii=False)
+    con.execute(f"DELETE FROM catalog_fts WHERE rowid IN ({ids})", (payload,))
+    con.execute(f"{CATALOG_FTS_SQL} WHERE si.item_id IN ({ids})", (payload,))
+
+
+def import_catalog(path: str | Path, batch_size: int = IMPORT_BATCH, rejects_path: str | Path | None = None) -> dict:
+    path = Path(path).resolve()
+    rejects_path = Path(rejects_path or path.with_name(path.name + ".rejects.csv"))
+    started = time.perf_counter()
+    known = {key: dict(refs.ids(key)) for key in IMPORT_REFS}
+    stats = {"imported": 0, "rejected": 0}
+    rejects = []
+
+    def flush(batch: list[tuple[int, dict]], records: dict[int, dict]) -> None:
+        futures = [(line_no, pool.submit(import_photo, item)) for line_no, item in batch if item["photo"]]
+        items = [item for _, item in batch if not item["photo"]]
+        for line_no, future in futures:
+            try:
+                items.append(future.result())
+            except Exception as ex:
+                rejects.append((line_no, f"фото: {ex}", records[line_no]))
+        with connections.write() as con:
+            created = resolve_refs(con, known, items)
+            con.execute("INSERT INTO catalog_fts_pause VALUES (1)")
+            con.executemany(IMPORT_UPSERT_SQL, items)
+            con.execute("DELETE FROM catalog_fts_pause")
+            refresh_catalog_fts(con, [item["sku"] for item in items])
+            prune_changes(con)
+        if created:
+            refs.invalidate(*created)
+        item_search.invalidate()
+        stats["imported"] += len(items)
+
+    batch, batch_records = [], {}
+    with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1), thread_name_prefix="ug-import") as pool:
+        for line_no, record in read_feed(path):
+            try:
+                batch.append((line_no, parse_feed_record(record, path.parent)))
+                batch_records[line_no] = record
+            except ValueError as ex:
+                rejects.append((line_no, str(ex), record))
+            if len(batch) >= batch_size:
+                flush(batch, batch_records)
+                batch, batch_records = [], {}
+        if batch:
+            flush(batch, batch_records)
+
+    stats["rejected"] = len(rejects)
+    if rejects:
+        with rejects_path.open("w", encoding="utf-8", newline="") as fh:
+            out = csv.writer(fh)
+            out.writerow(["line", "reason", "record"])
+            for line_no, reason, record in rejects:
+                raw = record if isinstance(record, str) else json.dumps(record, ensure_ascii=False)
+                out.writerow([line_no, reason, raw])
+    stats["rejects_path"] = str(rejects_path) if rejects else None
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+
+def print_import(path: str, batch_size: int, rejects_path: str | None) -> bool:
+    stats = import_catalog(path, batch_size, rejects_path)
+    seconds = max(stats["seconds"], 1e-9)
+    print(f"Импортировано: {stats['imported']}, отклонено: {stats['rejected']}")
+    print(f"Время: {seconds:.2f} с, {stats['imported'] / seconds:.0f} строк/с")
+    if stats["rejects_path"]:
+        print(f"Отчёт об ошибках: {stats['rejects_path']}")
+    return stats["rejected"] == 0
+
+
+EXPORT_SQL = {
+    "catalog": f"SELECT {CATALOG_COLUMNS} FROM {CATALOG_TABLES} ORDER BY si.item_id",
+    "orders": (
+        f"SELECT {ORDERS_COLUMNS}, sor.row_id, sor.item_id, si.sku, si.item_name, sor.qty, sor.unit_price "
+        f"FROM {ORDERS_TABLES} "
+        "LEFT JOIN sales_order_rows sor ON sor.order_id = so.order_id "
+        "LEFT JOIN stock_items si ON si.item_id = sor.item_id "
+        "ORDER BY so.order_id, sor.row_id"
+    ),
+}
+ORDER_ROW_FIELDS = ["row_id", "item_id", "sku", "item_name", "qty", "unit_price"]
+
+
+def fetch_stream(cursor: sqlite3.Cursor, size: int = EXPORT_FETCH):
+    while rows := cursor.fetchmany(size):
+        yield from rows
+
+
+def nest_order_rows(rows, columns: list[str]):
+    head = columns[: -len(ORDER_ROW_FIELDS)]
+    order = None
+    for row in rows:
+        if order is None or order["order_id"] != row["order_id"]:
+            if order is not None:
+                yield order
+            order = {key: row[key] for key in head} | {"rows": []}
+        if row["row_id"] is not None:
+            order["rows"].append({key: row[key] for key in ORDER_ROW_FIELDS})
+    if order is not None:
+        yield order
+
+
+def export_data(kind: str, path: str | Path) -> dict:
+    path = Path(path)
+    compress = path.suffix.lower() == ".gz"
+    jsonl = Path(path.stem if compress else path.name).suffix.lower() in (".jsonl", ".ndjson")
+    started = time.perf_counter()
+    cursor = connections.read().execute(EXPORT_SQL[kind])
+    columns = [col[0] for col in cursor.description]
+    rows = fetch_stream(cursor)
+    count = 0
+    opener = gzip.open if compress else open
+    with opener(path, "wt", encoding="utf-8", newline="") as fh:
+        if jsonl:
+            records = nest_order_rows(rows, columns) if kind == "orders" else (dict(row) for row in rows)
+            for record in records:
+                fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+                count += 1
+        else:
+            out = csv.writer(fh)
+            out.writerow(columns)
+            for row in rows:
+                out.writerow(row)
+                count += 1
+    cursor.close()
+    return {"records": count, "path": str(path), "seconds": time.perf_counter() - started}
+
+
+def print_export(kind: str, path: str) -> None:
+    stats = export_data(kind, path)
+    seconds = max(stats["seconds"], 1e-9)
+    print(f"Выгружено записей: {stats['records']} в {stats['path']}")
+    print(f"Время: {seconds:.2f} с, {stats['records'] / seconds:.0f} записей/с")
+
+
+class KeysetPager:
+    def __init__(
+        self,
+        columns: str,
+        tables: str,
+        where: list[str],
+        params: list,
+        keys: list[str],
+        desc: bool = False,
+        page_size: int = PAGE_SIZE,
+        max_pages: int = MAX_PAGES,
+    ) -> None:
+        self.columns = columns
+        self.tables = tables
+        self.where = where
+        self.params = params
+        self.keys = keys
+        self.desc = desc
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.pages: OrderedDict[int, list[sqlite3.Row]] = OrderedDict()
+        self.bounds: dict[int, tuple] = {}
+        self.lock = threading.Lock()
+
+    def count(self, aggregates: str = "COUNT(*)") -> sqlite3.Row:
+        where = f" WHERE {' AND '.join(self.where)}" if self.where else ""
+        return connections.read().execute(f"SELECT {aggregates} FROM {self.tables}{where}", self.params).fetchone()
+
+    def sql(self, page: int) -> tuple[str, list]:
+        where, params, offset = list(self.where), list(self.params), 0
+        if page > 0 and page - 1 in self.bounds:
+            marks = ", ".join("?" * len(self.keys))
+            where.append(f"({', '.join(self.keys)}) {'<' if self.desc else '>'} ({marks})")
+            params.extend(self.bounds[page - 1])
+        else:
+            offset = page * self.page_size
+        direction = " DESC" if self.desc else ""
+        key_cols = ", ".join(f"{key} k{i}" for i, key in enumerate(self.keys))
+        query = f"SELECT {self.columns}, {key_cols} FROM {self.tables}"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY " + ", ".join(f"{key}{direction}" for key in self.keys) + " LIMIT ? OFFSET ?"
+        return query, [*params, self.page_size, offset]
+
+    def fetch(self, page: int) -> list[sqlite3.Row]:
+        rows = connections.read().execute(*self.sql(page)).fetchall()
+        if rows:
+            self.bounds[page] = tuple(rows[-1][f"k{i}"] for i in range(len(self.keys)))
+        return rows
+
+    def cached(self, page: int) -> list[sqlite3.Row] | None:
+        with self.lock:
+            rows = self.pages.get(page)
+            if rows is not None:
+                self.pages.move_to_end(page)
+            return rows
+
+    def page(self, page: int) -> list[sqlite3.Row]:
+        rows = self.cached(page)
+        if rows is None:
+            rows = self.fetch(page)
+            with self.lock:
+                self.pages[page] = rows
+                while len(self.pages) > self.max_pages:
+                    self.pages.popitem(last=False)
+        return rows
+
+    def rows(self, start: int, stop: int, fetch: bool = True) -> list[sqlite3.Row] | None:
+        start = max(start, 0)
+        out = []
+        for page in range(start // self.page_size, (stop - 1) // self.page_size + 1):
+            rows = self.page(page) if fetch else self.cached(page)
+            if rows is None:
+                return None
+            base = page * self.page_size
+            out.extend(rows[max(start - base, 0):stop - base])
+            if len(rows) < self.page_size:
+                break
+        return out
+
+    def lookup(self, id_col: str, ids) -> dict[int, sqlite3.Row]:
+        ids = list(ids)
+        where = [*self.where, f"{id_col} IN ({','.join('?' * len(ids))})"]
+        key_cols = ", ".join(f"{key} k{i}" for i, key in enumerate(self.keys))
+        rows = connections.read().execute(
+            f"SELECT {self.columns}, {key_cols} FROM {self.tables} WHERE {' AND '.join(where)}", [*self.params, *ids]
+        )
+        name = id_col.rsplit(".", 1)[-1]
+        return {row[name]: row for row in rows}
+
+    def key(self, row: sqlite3.Row) -> tuple:
+        return tuple(row[f"k{i}"] for i in range(len(self.keys)))
+
+    def splice(self, rows: list[sqlite3.Row], id_col: str, ids, fresh: dict[int, sqlite3.Row]) -> bool:
+        name = id_col.rsplit(".", 1)[-1]
+        for pos, row in enumerate(rows):
+            if row[name] in ids:
+                new = fresh.get(row[name])
+                if new is None or self.key(new) != self.key(row):
+                    return False
+                rows[pos] = new
+        return True
+
+    def window(self, rows: list[sqlite3.Row], id_col: str, ids, fresh: dict[int, sqlite3.Row], complete: bool) -> bool:
+        if not self.splice(rows, id_col, ids, fresh):
+            return False
+        name = id_col.rsplit(".", 1)[-1]
+        seen = {row[name] for row in rows}
+        unseen = [row for row_id, row in fresh.items() if row_id not in seen]
+        if not unseen:
+            return True
+        if complete or not rows:
+            return False
+        high = self.key(rows[-1])
+        return not any(self.key(row) >= high if self.desc else self.key(row) <= high for row in unseen)
+
+    def patch(self, id_col: str, ids) -> bool:
+        fresh = self.lookup(id_col, ids)
+        name = id_col.rsplit(".", 1)[-1]
+        with self.lock:
+            pages = sorted(self.pages)
+            if pages != list(range(len(pages))):
+                cached = {row[name] for rows in self.pages.values() for row in rows}
+                return cached.issuperset(ids) and all(self.splice(self.pages[page], id_col, ids, fresh) for page in pages)
+            rows = [row for page in pages for row in self.pages[page]]
+            if not self.window(rows, id_col, ids, fresh, not pages or len(self.pages[pages[-1]]) < self.page_size):
+                return False
+            for page in pages:
+                self.pages[page] = rows[page * self.page_size:(page + 1) * self.page_size]
+            return True
+
+CATALOG_SORTS = {
+    "": (["si.item_id"], False),
+    "qty": (["si.qty", "si.item_id"], False),
+    "-qty": (["si.qty", "si.item_id"], True),
+    "price": (["si.final_price", "si.item_id"], False),
+    "-price": (["si.final_price", "si.item_id"], True),
+    "promo": (["si.promo", "si.item_id"], False),
+    "-promo": (["si.promo", "si.item_id"], True),
+    "name": (["si.item_name", "si.item_id"], False),
+    "-name": (["si.item_name", "si.item_id"], True),
+    "id": (["si.item_id"], False),
+    "-id": (["si.item_id"], True),
+    "sku": (["si.sku", "si.item_id"], False),
+    "-sku": (["si.sku", "si.item_id"], True),
+    "base_price": (["si.base_price", "si.item_id"], False),
+    "-base_price": (["si.base_price", "si.item_id"], True),
+    "group": (["g.title", "si.item_id"], False),
+    "-group": (["g.title", "si.item_id"], True),
+    "maker": (["mk.title", "si.item_id"], False),
+    "-maker": (["mk.title", "si.item_id"], True),
+    "vendor": (["vd.title", "si.item_id"], False),
+    "-vendor": (["vd.title", "si.item_id"], True),
+    "about": (["si.about", "si.item_id"], False),
+    "-about": (["si.about", "si.item_id"], True),
+}
+CATALOG_SORT_COLUMNS = {
+    "": "item_id",
+    "id": "item_id",
+    "sku": "sku",
+    "name": "item_name",
+    "group": "group_title",
+    "about": "about",
+    "maker": "maker_title",
+    "vendor": "vendor_title",
+    "base_price": "base_price",
+    "price": "final_price",
+    "qty": "qty",
+    "promo": "promo",
+}
+SNAPSHOT_SQL = (
+    "SELECT item_id, group_id, maker_id, vendor_id, qty, base_price, promo, final_price, sku, item_name, about, photo_path, thumb_path "
+    "FROM stock_items"
+)
+SNAPSHOT_ARRAYS = {
+    "item_id": "q", "group_id": "q", "maker_id": "q", "vendor_id": "q",
+    "qty": "q", "base_price": "d", "promo": "d", "final_price": "d",
+}
+SNAPSHOT_TEXTS = ("sku", "item_name", "about", "photo_path", "thumb_path")
+SNAPSHOT_TITLES = {"group_title": ("group", "group_id"), "maker_title": ("maker", "maker_id"), "vendor_title": ("vendor", "vendor_id")}
+SNAPSHOT_PRESORTED = ("item_id", "qty", "final_price", "promo", "item_name")
+
+
+@dataclass(frozen=True)
+class CatalogQuery:
+    search: str = ""
+    vendor_id: int | None = None
+    sort: str = ""
+    price_from: str = ""
+    price_to: str = ""
+
+
+@dataclass(frozen=True)
+class CatalogCounts:
+    total: int
+    zero: int
+    high: int
+
+
+@dataclass(frozen=True)
+class OrderQuery:
+    state_id: int | None = None
+    location_id: int | None = None
+    date_field: str = "created_on"
+    date_from: str = ""
+    date_to: str = ""
+    text: str = ""
+
+
+@dataclass
+class ItemData:
+    sku: str
+    item_name: str
+    group_id: int
+    about: str
+    maker_id: int
+    vendor_id: int
+    base_price: float
+    measure_id: int
+    qty: int
+    promo: float
+    photo_path: str | None = None
+    thumb_path: str | None = None
+    row_version: int = 0
+
+    def validate(self) -> None:
+        if not self.sku or not self.item_name:
+            raise ValueError("SKU и название обязательны")
+        if self.base_price < 0 or self.qty < 0:
+            raise ValueError("Цена и остаток не могут быть отрицательными")
+        if self.promo < 0 or self.promo > 100:
+            raise ValueError("Скидка должна быть 0..100")
+
+
+class StaleItemError(ValueError):
+    pass
+
+
+class StockError(ValueError):
+    pass
+
+
+@dataclass
+class OrderLine:
+    item_id: int
+    qty: int
+    unit_price: float
+    row_id: int | None = None
+
+
+@dataclass
+class OrderData:
+    order_code: str
+    customer_name: str
+    state_id: int
+    location_id: int
+    created_on: str
+    issued_on: str
+    lines: list[OrderLine] = field(default_factory=list)
+
+    def validate(self) -> None:
+        if not self.order_code or not self.customer_name:
+            raise ValueError("Код заказа и клиент обязательны")
+        dt.date.fromisoformat(self.created_on)
+        dt.date.fromisoformat(self.issued_on)
+
+
+def authenticate(username: str, password: str) -> sqlite3.Row | None:
+    return connections.read().execute(
+        "SELECT account_id, fio, role_code FROM accounts WHERE username=? AND pass_hash=?",
+        (username, digest(password)),
+    ).fetchone()
+
+
+def price_bound(value: str) -> float | None:
+    try:
+        return float(value.replace(",", "."))
+    except ValueError:
+        return None
+
+
+def catalog_filter(query: CatalogQuery) -> tuple[str, list[str], list]:
+    joins, where, params = "", [], []
+    match = fts_query(query.search)
+    if match:
+        joins = " JOIN catalog_fts ON catalog_fts.rowid=si.item_id"
+        where.append("catalog_fts MATCH ?")
+        params.append(match)
+    if query.vendor_id:
+        where.append("si.vendor_id = ?")
+        params.append(query.vendor_id)
+    for price, op in (price_bound(query.price_from), ">="), (price_bound(query.price_to), "<="):
+        if price is not None:
+            where.append(f"si.final_price {op} ?")
+            params.append(price)
+    return joins, where, params
+
+
+def catalog_pager(query: CatalogQuery) -> KeysetPager:
+    joins, where, params = catalog_filter(query)
+    keys, desc = CATALOG_SORTS[query.sort]
+    if joins and not query.sort:
+        keys = ["catalog_fts.rank", "si.item_id"]
+    return KeysetPager(CATALOG_COLUMNS, CATALOG_TABLES + joins, where, params, keys, desc)
+
+
+def catalog_counts(query: CatalogQuery) -> CatalogCounts:
+    joins, where, params = catalog_filter(query)
+    con = connections.read()
+
+    def select(aggregates: str, *extra: str) -> sqlite3.Row:
+        conds = [*where, *extra]
+        sql = f"SELECT {aggregates} FROM stock_items si{joins}"
+        if conds:
+            sql += " WHERE " + " AND ".join(conds)
+        return con.execute(sql, params).fetchone()
+
+    if joins or where not in ([], ["si.vendor_id = ?"]):
+        row = select(f"COUNT(*), COALESCE(SUM(si.qty = 0), 0), COALESCE(SUM(si.promo > {HIGH_PROMO}), 0)")
+        return CatalogCounts(*row)
+    return CatalogCounts(
+        select("COUNT(*)")[0],
+        select("COUNT(*)", "si.qty = 0")[0],
+        select("COUNT(*)", f"si.promo > {HIGH_PROMO}")[0],
+    )
+
+
+def catalog_matches(search: str) -> list[int] | None:
+    match = fts_query(search)
+    if not match:
+        return None
+    rows = connections.read().execute("SELECT rowid FROM catalog_fts WHERE catalog_fts MATCH ? ORDER BY rank", (match,))
+    return [row[0] for row in rows]
+
+
+class CatalogSnapshot:
+    def __init__(self) -> None:
+        self.columns: dict[str, array | list] = {name: array(code) for name, code in SNAPSHOT_ARRAYS.items()}
+        self.columns.update((name, []) for name in (*SNAPSHOT_TEXTS, *SNAPSHOT_TITLES))
+        self.index: dict[int, int] = {}
+        self.orders: dict[str, array] = {}
+        self.zero = 0
+        self.high = 0
+
+    @classmethod
+    def load(cls) -> "CatalogSnapshot":
+        snapshot = cls()
+        snapshot.extend(cls.select(f"{SNAPSHOT_SQL} ORDER BY item_id"))
+        for column in SNAPSHOT_PRESORTED:
+            snapshot.order(column)
+        return snapshot
+
+    @staticmethod
+    def select(sql: str, params: list | tuple = ()) -> list[tuple]:
+        cur = connections.read().execute(sql, params)
+        cur.row_factory = None
+        return cur.fetchall()
+
+    @classmethod
+    def fetch(cls, ids) -> dict[int, tuple]:
+        ids = list(ids)
+        rows = cls.select(f"{SNAPSHOT_SQL} WHERE item_id IN ({','.join('?' * len(ids))})", ids)
+        return {row[0]: row for row in rows}
+
+    def extend(self, rows: list[tuple]) -> None:
+        start = len(self.columns["item_id"])
+        for pos, name in enumerate((*SNAPSHOT_ARRAYS, *SNAPSHOT_TEXTS)):
+            self.columns[name].extend(row[pos] for row in rows)
+        for name, (kind, id_col) in SNAPSHOT_TITLES.items():
+            titles = refs.titles(kind)
+            self.columns[name].extend(titles[ref_id] for ref_id in self.columns[id_col][start:])
+        self.index.update((item_id, pos) for pos, item_id in enumerate(self.columns["item_id"][start:], start))
+        self.zero += self.columns["qty"][start:].count(0)
+        self.high += sum(1 for promo in self.columns["promo"][start:] if promo > HIGH_PROMO)
+
+    def tally(self, pos: int, sign: int) -> None:
+        self.zero += sign * (self.columns["qty"][pos] == 0)
+        self.high += sign * (self.columns["promo"][pos] > HIGH_PROMO)
+
+    def update(self, pos: int, row: tuple) -> None:
+        for n, name in enumerate((*SNAPSHOT_ARRAYS, *SNAPSHOT_TEXTS)):
+            self.columns[name][pos] = row[n]
+        for name, (kind, id_col) in SNAPSHOT_TITLES.items():
+            self.columns[name][pos] = refs.titles(kind)[self.columns[id_col][pos]]
+
+    def key(self, column: str):
+        values, ids = self.columns[column], self.columns["item_id"]
+        return lambda pos: (values[pos], ids[pos])
+
+    def order(self, column: str) -> array:
+        perm = self.orders.get(column)
+        if perm is None:
+            base = sorted(self.index.values(), key=self.columns["item_id"].__getitem__) if column == "item_id" else self.order("item_id")
+            perm = self.orders[column] = array("q", sorted(base, key=self.columns[column].__getitem__))
+        return perm
+
+    def row(self, pos: int) -> dict:
+        return {name: values[pos] for name, values in self.columns.items()}
+
+    def apply(self, ids, fresh: dict[int, tuple]) -> None:
+        keys = {column: self.key(column) for column in self.orders}
+        for item_id in sorted(ids):
+            pos = self.index.get(item_id)
+            if pos is not None:
+                self.tally(pos, -1)
+                for column, perm in self.orders.items():
+                    del perm[bisect.bisect_left(perm, keys[column](pos), key=keys[column])]
+            row = fresh.get(item_id)
+            if row is None:
+                self.index.pop(item_id, None)
+                continue
+            if pos is None:
+                self.extend([row])
+                pos = self.index[item_id]
+            else:
+                self.update(pos, row)
+                self.tally(pos, 1)
+            for column, perm in self.orders.items():
+                bisect.insort(perm, pos, key=keys[column])
+
+    def view(self, query: CatalogQuery, matches: list[int] | None = None) -> "CatalogView":
+        if matches is not None and not query.sort:
+            positions = [self.index[item_id] for item_id in matches if item_id in self.index]
+        else:
+            positions = self.order(CATALOG_SORT_COLUMNS[query.sort.lstrip("-")])
+            if query.sort.startswith("-"):
+                positions = positions[::-1]
+            if matches is not None:
+                wanted, ids = set(matches), self.columns["item_id"]
+                positions = [pos for pos in positions if ids[pos] in wanted]
+        if query.vendor_id:
+            vendors = self.columns["vendor_id"]
+            positions = [pos for pos in positions if vendors[pos] == query.vendor_id]
+        low, high, prices = price_bound(query.price_from), price_bound(query.price_to), self.columns["final_price"]
+        if low is not None:
+            positions = [pos for pos in positions if prices[pos] >= low]
+        if high is not None:
+            positions = [pos for pos in positions if prices[pos] <= high]
+        return CatalogView(self, positions)
+
+
+class CatalogView:
+    def __init__(self, snapshot: CatalogSnapshot, positions: array | list[int]) -> None:
+        self.snapshot = snapshot
+        self.positions = positions
+
+    def rows(self, start: int, stop: int, fetch: bool = True) -> list[dict]:
+        return [self.snapshot.row(pos) for pos in self.positions[max(start, 0):stop]]
+
+    def counts(self) -> CatalogCounts:
+        if len(self.positions) == len(self.snapshot.index):
+            return CatalogCounts(len(self.positions), self.snapshot.zero, self.snapshot.high)
+        qty, promo = self.snapshot.columns["qty"], self.snapshot.columns["promo"]
+        return CatalogCounts(
+            len(self.positions),
+            sum(1 for pos in self.positions if qty[pos] == 0),
+            sum(1 for pos in self.positions if promo[pos] > HIGH_PROMO),
+        )
+
+
+def orders_pager(query: OrderQuery) -> KeysetPager:
+    where, params = [], []
+    if query.state_id:
+        where.append("so.state_id = ?")
+        params.append(query.state_id)
+    if query.location_id:
+        where.append("so.location_id = ?")
+        params.append(query.location_id)
+    date_col = "so.issued_on" if query.date_field == "issued_on" else "so.created_on"
+    tables, keys = ORDERS_TABLES, [date_col, "so.order_id"]
+    for value, op in ((query.date_from, ">="), (query.date_to, "<=")):
+        try:
+            dt.date.fromisoformat(value)
+        except ValueError:
+            continue
+        where.append(f"{date_col} {op} ?")
+        params.append(value)
+    match = fts_query(query.text)
+    if match:
+        tables += " JOIN orders_fts ON orders_fts.rowid = so.order_id"
+        where.append("orders_fts MATCH ?")
+        params.append(match)
+        keys = ["orders_fts.rowid"]
+    return KeysetPager(ORDERS_COLUMNS, tables, where, params, keys, True, ORDERS_PAGE_SIZE)
+
+
+def list_vendors() -> dict[str, int]:
+    return refs.ids("vendor")
+
+
+def add_vendor(title: str) -> int:
+    with connections.write() as con:
+        vendor_id = con.execute("INSERT INTO vendors(title) VALUES (?)", (title,)).lastrowid
+    refs.invalidate("vendor")
+    return vendor_id
+
+
+def item_refs() -> dict[str, dict[str, int]]:
+    return {key: refs.ids(key) for key in ("group", "maker", "vendor", "measure")}
+
+
+def load_item(item_id: int) -> sqlite3.Row | None:
+    return connections.read().execute(
+        """
+        SELECT si.*, g.title gt, mk.title mt, vd.title vt, ms.title ust
+        FROM stock_items si
+        JOIN groups g ON g.group_id=si.group_id
+        JOIN makers mk ON mk.maker_id=si.maker_id
+        JOIN vendors vd ON vd.vendor_id=si.vendor_id
+        JOIN measures ms ON ms.measure_id=si.measure_id
+        WHERE si.item_id=?
+        """,
+        (item_id,),
+    ).fetchone()
+
+
+def save_item(item: ItemData, item_id: int | None = None) -> int:
+    item.validate()
+    values = (
+        item.sku, item.item_name, item.group_id, item.about, item.maker_id, item.vendor_id,
+        item.base_price, item.measure_id, item.qty, item.promo, item.photo_path, item.thumb_path,
+    )
+    with connections.write() as con:
+        if item_id is None:
+            item_id = con.execute(
+                """
+                INSERT INTO stock_items(sku, item_name, group_id, about, maker_id, vendor_id, base_price, measure_id, qty, promo, photo_path, thumb_path)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                values,
+            ).lastrowid
+        else:
+            updated = con.execute(
+                """
+                UPDATE stock_items
+                SET sku=?, item_name=?, group_id=?, about=?, maker_id=?, vendor_id=?, base_price=?, measure_id=?, qty=?, promo=?, photo_path=?, thumb_path=?,
+                    row_version=row_version + 1
+                WHERE item_id=? AND row_version=?
+                """,
+                (*values, item_id, item.row_version),
+            ).rowcount
+            if not updated:
+                raise StaleItemError("Товар изменён или удалён на другом рабочем месте. Откройте карточку заново.")
+    item_search.invalidate()
+    return item_id
+
+
+def delete_item(item_id: int) -> bool:
+    with connections.write() as con:
+        if con.execute("SELECT 1 FROM sales_order_rows WHERE item_id=? LIMIT 1", (item_id,)).fetchone():
+            return False
+        row = con.execute("SELECT photo_path, thumb_path FROM stock_items WHERE item_id=?", (item_id,)).fetchone()
+        con.execute("DELETE FROM stock_items WHERE item_id=?", (item_id,))
+    item_search.invalidate()
+    if row:
+        discard_item_images(row["photo_path"], row["thumb_path"])
+    return True
+
+
+def order_refs() -> tuple[dict[str, int], dict[str, int]]:
+    return refs.ids("state"), refs.ids("location")
+
+
+PICKER_SKU_SQL = "SELECT item_id FROM stock_items WHERE sku >= ? AND sku < ? ORDER BY sku LIMIT ?"
+PICKER_NAME_SQL = "SELECT rowid FROM catalog_fts WHERE catalog_fts MATCH ? ORDER BY rank LIMIT ?"
+
+
+class ItemSearch:
+    def __init__(self, limit: int = PICKER_LIMIT, size: int = PICKER_CACHE) -> None:
+        self.limit = limit
+        self.size = size
+        self.lock = threading.Lock()
+        self.cache: OrderedDict[str, list[int]] = OrderedDict()
+        self.generation = 0
+
+    def ids(self, text: str) -> list[int]:
+        with self.lock:
+            if text in self.cache:
+                self.cache.move_to_end(text)
+                return self.cache[text]
+            generation = self.generation
+        con = connections.read()
+        ids = [row[0] for row in con.execute(PICKER_SKU_SQL, [*prefix_range(text.upper()), self.limit])]
+        match = fts_query(text)
+        if match and len(ids) < self.limit:
+            for row in con.execute(PICKER_NAME_SQL, (f"{{sku item_name}} : ({match})", self.limit)):
+                if row[0] not in ids:
+                    ids.append(row[0])
+        ids = ids[: self.limit]
+        with self.lock:
+            if generation != self.generation:
+                return ids
+            self.cache[text] = ids
+            while len(self.cache) > self.size:
+                self.cache.popitem(last=False)
+        return ids
+
+    def find(self, text: str) -> list[sqlite3.Row]:
+        text = text.strip()
+        if not text:
+            return []
+        ids = self.ids(text)
+        if not ids:
+            return []
+        rows = connections.read().execute(
+            f"SELECT item_id, sku, item_name, base_price, qty FROM stock_items WHERE item_id IN ({','.join('?' * len(ids))})",
+            ids,
+        ).fetchall()
+        order = {item_id: pos for pos, item_id in enumerate(ids)}
+        return sorted(rows, key=lambda row: order[row["item_id"]])
+
+    def invalidate(self) -> None:
+        with self.lock:
+            self.generation += 1
+            self.cache.clear()
+
+
+item_search = ItemSearch()
+
+
+def load_order(order_id: int) -> tuple[sqlite3.Row | None, list[sqlite3.Row]]:
+    con = connections.read()
+    head = con.execute(
+        """
+        SELECT so.*, st.title state_title, pl.address loc
+        FROM sales_orders so
+        JOIN order_states st ON st.state_id=so.state_id
+        JOIN pickup_locations pl ON pl.location_id=so.location_id
+        WHERE so.order_id=?
+        """,
+        (order_id,),
+    ).fetchone()
+    rows = con.execute(
+        """
+        SELECT sor.row_id, sor.item_id, si.sku, si.item_name, sor.qty, sor.unit_price
+        FROM sales_order_rows sor
+        JOIN stock_items si ON si.item_id=sor.item_id
+        WHERE sor.order_id=?
+        """,
+        (order_id,),
+    ).fetchall()
+    return head, rows
+
+
+def save_order(order: OrderData, order_id: int | None = None) -> int:
+    order.validate()
+    head = (order.order_code, order.customer_name, order.state_id, order.location_id, order.created_on, order.issued_on)
+    with connections.write() as con:
+        existing = {}
+        if order_id is None:
+            order_id = con.execute(
+                "INSERT INTO sales_orders(order_code, customer_name, state_id, location_id, created_on, issued_on) VALUES (?, ?, ?, ?, ?, ?)",
+                head,
+            ).lastrowid
+        else:
+            con.execute(
+                "UPDATE sales_orders SET order_code=?, customer_name=?, state_id=?, location_id=?, created_on=?, issued_on=? WHERE order_id=?",
+                (*head, order_id),
+            )
+            existing = {
+                row[0]: tuple(row[1:])
+                for row in con.execute("SELECT row_id, item_id, qty, unit_price, reserved FROM sales_order_rows WHERE order_id=?", (order_id,))
+            }
+        kept = {line.row_id for line in order.lines if line.row_id in existing}
+        moved = {line.row_id for line in order.lines if line.row_id in kept and existing[line.row_id][:2] != (line.item_id, line.qty)}
+        con.executemany("DELETE FROM sales_order_rows WHERE row_id=?", [(row_id,) for row_id in existing if row_id not in kept])
+        con.executemany(
+            "UPDATE sales_order_rows SET item_id=?, qty=?, unit_price=?, reserved=? WHERE row_id=?",
+            [
+                (line.item_id, line.qty, line.unit_price, 1 if line.row_id in moved else existing[line.row_id][3], line.row_id)
+                for line in order.lines
+                if line.row_id in kept and existing[line.row_id][:3] != (line.item_id, line.qty, line.unit_price)
+            ],
+        )
+        con.executemany(
+            "INSERT INTO sales_order_rows(order_id, item_id, qty, unit_price, reserved) VALUES (?, ?, ?, ?, 1)",
+            [(order_id, line.item_id, line.qty, line.unit_price) for line in order.lines if line.row_id not in kept],
+        )
+        demand = {}
+        for row_id, (item_id, qty, _, reserved) in existing.items():
+            if reserved and (row_id not in kept or row_id in moved):
+                demand[item_id] = demand.get(item_id, 0) - qty
+        for line in order.lines:
+            if line.row_id not in kept or line.row_id in moved:
+                demand[line.item_id] = demand.get(line.item_id, 0) + line.qty
+        release_stock(con, {item_id: -qty for item_id, qty in demand.items() if qty < 0})
+        reserve_stock(con, {item_id: qty for item_id, qty in demand.items() if qty > 0})
+    return order_id
+
+
+STOCK_RESERVE_SQL = "UPDATE stock_items SET qty = qty - ?, row_version = row_version + 1 WHERE item_id = ? AND qty >= ?"
+STOCK_RELEASE_SQL = "UPDATE stock_items SET qty = qty + ?, row_version = row_version + 1 WHERE item_id = ?"
+
+
+def reserve_stock(con: sqlite3.Connection, demand: dict[int, int]) -> None:
+    if not demand or con.executemany(STOCK_RESERVE_SQL, [(qty, item_id, qty) for item_id, qty in demand.items()]).rowcount == len(demand):
+        return
+    short = con.execute(
+        f"SELECT item_id, sku, qty FROM stock_items WHERE item_id IN ({','.join('?' * len(demand))})",
+        list(demand),
+    ).fetchall()
+    raise StockError(
+        "Недостаточно на складе: "
+        + ", ".join(f"{row['sku']} (доступно {row['qty']})" for row in short if row["qty"] < demand[row["item_id"]])
+    )
+
+
+def release_stock(con: sqlite3.Connection, returned: dict[int, int]) -> None:
+    con.executemany(STOCK_RELEASE_SQL, [(qty, item_id) for item_id, qty in returned.items()])
+
+
+def delete_order(order_id: int) -> None:
+    with connections.write() as con:
+        release_stock(con, {
+            row[0]: row[1]
+            for row in con.execute("SELECT item_id, SUM(qty) FROM sales_order_rows WHERE order_id=? AND reserved=1 GROUP BY item_id", (order_id,))
+        })
+        con.execute("DELETE FROM sales_orders WHERE order_id=?", (order_id,))
+
+
+ROLLUPS = {
+    "sales_daily": (
+        "day, item_id, location_id, qty, revenue",
+        """
+        SELECT so.created_on day, sor.item_id item_id, so.location_id location_id, SUM(sor.qty) qty, SUM(sor.qty * sor.unit_price) revenue
+        FROM sales_order_rows sor JOIN sales_orders so ON so.order_id = sor.order_id
+        GROUP BY so.created_on, sor.item_id, so.location_id
+        """,
+        "qty != 0 OR ROUND(revenue, 2) != 0",
+    ),
+    "sales_totals": (
+        "day, location_id, orders, qty, revenue",
+        """
+        SELECT so.created_on day, so.location_id location_id, COUNT(*) orders, COALESCE(SUM(r.qty), 0) qty, COALESCE(SUM(r.revenue), 0) revenue
+        FROM sales_orders so
+        LEFT JOIN (SELECT order_id, SUM(qty) qty, SUM(qty * unit_price) revenue FROM sales_order_rows GROUP BY order_id) r ON r.order_id = so.order_id
+        GROUP BY so.created_on, so.location_id
+        """,
+        "orders != 0 OR qty != 0 OR ROUND(revenue, 2) != 0",
+    ),
+}
+
+
+def rebuild_rollups(con: sqlite3.Connection) -> None:
+    for table, (columns, sql, _) in ROLLUPS.items():
+        con.execute(f"DELETE FROM {table}")
+        con.execute(f"INSERT INTO {table}({columns}) {sql}")
+
+
+def check_rollups(con: sqlite3.Connection) -> list[str]:
+    report = []
+    for table, (columns, sql, live) in ROLLUPS.items():
+        columns = columns.replace("revenue", "ROUND(revenue, 2)")
+        stored = f"SELECT {columns} FROM {table} WHERE {live}"
+        expected = f"SELECT {columns} FROM ({sql})"
+        missing = con.execute(f"SELECT COUNT(*) FROM ({expected} EXCEPT {stored})").fetchone()[0]
+        extra = con.execute(f"SELECT COUNT(*) FROM ({stored} EXCEPT {expected})").fetchone()[0]
+        if missing or extra:
+            report.append(f"{table}: не хватает {missing}, лишних {extra}")
+    return report
+
+
+SALES_DIMENSIONS = {
+    "item": ("sales_daily", "r.item_id", None, "si.sku || ' ' || si.item_name", "JOIN stock_items si ON si.item_id = a.key"),
+    "vendor": (
+        "sales_daily", "r.item_id", "si.vendor_id", "vd.title",
+        "JOIN stock_items si ON si.item_id = a.key JOIN vendors vd ON vd.vendor_id = si.vendor_id",
+    ),
+    "group": (
+        "sales_daily", "r.item_id", "si.group_id", "g.title",
+        "JOIN stock_items si ON si.item_id = a.key JOIN groups g ON g.group_id = si.group_id",
+    ),
+    "location": ("sales_totals", "r.location_id", None, "pl.address", "JOIN pickup_locations pl ON pl.location_id = a.key"),
+    "day": ("sales_totals", "r.day", None, "a.key", ""),
+    "month": ("sales_totals", "substr(r.day, 1, 7)", None, "a.key", ""),
+}
+SALES_SERIES = ("day", "month")
+
+
+@dataclass(frozen=True)
+class SalesQuery:
+    date_from: str
+    date_to: str
+    dimension: str = "item"
+    location_id: int | None = None
+    limit: int = 20
+
+    def previous(self) -> "SalesQuery":
+        start, end = dt.date.fromisoformat(self.date_from), dt.date.fromisoformat(self.date_to)
+        prev_end = start - dt.timedelta(days=1)
+        return SalesQuery((prev_end - (end - start)).isoformat(), prev_end.isoformat(), self.dimension, self.location_id, self.limit)
+
+
+@dataclass(frozen=True)
+class SalesTotals:
+    orders: int
+    qty: int
+    revenue: float
+
+
+@dataclass
+class SalesReport:
+    query: SalesQuery
+    rows: list[sqlite3.Row]
+    previous: dict
+    totals: SalesTotals
+    prev_totals: SalesTotals
+
+
+def sales_rows(query: SalesQuery, keys: list | None = None) -> list[sqlite3.Row]:
+    table, inner, outer, title, joins = SALES_DIMENSIONS[query.dimension]
+    where, params = ["r.day BETWEEN ? AND ?"], [query.date_from, query.date_to]
+    if query.location_id is not None:
+        where.append("r.location_id = ?")
+        params.append(query.location_id)
+    if keys is not None:
+        marks = ",".join("?" * len(keys))
+        where.append(f"{inner} IN ({marks})" if outer is None else f"r.item_id IN (SELECT item_id FROM stock_items WHERE {outer.split('.')[1]} IN ({marks}))")
+        params.extend(keys)
+    source = f"SELECT {inner} key, SUM(r.qty) qty, SUM(r.revenue) revenue FROM {table} r WHERE {' AND '.join(where)} GROUP BY {inner}"
+    series = query.dimension in SALES_SERIES
+    rank, limit = ("key", "") if series else ("revenue DESC", " LIMIT ?")
+    if not series:
+        params.append(query.limit if keys is None else len(keys))
+    if outer is None:
+        sql = (
+            f"SELECT a.key, {title} title, a.qty, ROUND(a.revenue, 2) revenue "
+            f"FROM ({source} HAVING SUM(r.qty) <> 0 ORDER BY {rank}{limit}) a {joins} ORDER BY a.{rank}"
+        )
+    else:
+        sql = (
+            f"SELECT {outer} key, {title} title, SUM(a.qty) qty, ROUND(SUM(a.revenue), 2) revenue "
+            f"FROM ({source}) a {joins} GROUP BY {outer} HAVING SUM(a.qty) <> 0 ORDER BY {rank}{limit}"
+        )
+    return connections.read().execute(sql, params).fetchall()
+
+
+def sales_totals(query: SalesQuery) -> SalesTotals:
+    where, params = "day BETWEEN ? AND ?", [query.date_from, query.date_to]
+    if query.location_id is not None:
+        where += " AND location_id = ?"
+        params.append(query.location_id)
+    row = connections.read().execute(
+        f"SELECT COALESCE(SUM(orders), 0), COALESCE(SUM(qty), 0), ROUND(COALESCE(SUM(revenue), 0), 2) FROM sales_totals WHERE {where}",
+        params,
+    ).fetchone()
+    return SalesTotals(*row)
+
+
+def sales_report(query: SalesQuery) -> SalesReport:
+    prev = query.previous()
+    rows = sales_rows(query)
+    previous = {}
+    if rows and query.dimension not in SALES_SERIES:
+        previous = {row["key"]: row["revenue"] for row in sales_rows(prev, [row["key"] for row in rows])}
+    return SalesReport(query, rows, previous, sales_totals(query), sales_totals(prev))
+
+
+def command_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="UrbanGear")
+    parser.add_argument("--db", metavar="FILE", help="файл базы данных вместо urban_gear.db")
+    parser.add_argument("--check-plans", action="store_true", help="проверить планы горячих запросов")
+    parser.add_argument("--import", dest="import_path", metavar="FILE", help="импорт каталога из CSV или JSONL")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH, help="строк в одной транзакции импорта")
+    parser.add_argument("--rejects", metavar="FILE", help="куда записать отклонённые строки")
+    parser.add_argument("--export", choices=sorted(EXPORT_SQL), help="выгрузить каталог или заказы")
+    parser.add_argument("--out", metavar="FILE", help="файл выгрузки: .csv, .jsonl, с .gz для сжатия")
+    parser.add_argument("--trace", action="store_true", help="замерять SQL и писать медленные запросы в slow_queries.log")
+    parser.add_argument("--slow-ms", type=float, default=SLOW_QUERY_MS, help="порог медленного запроса, мс")
+    parser.add_argument("--seed", action="store_true", help="заполнить базу начальными данными")
+    parser.add_argument("--rebuild-rollups", action="store_true", help="пересчитать сводные таблицы продаж")
+    parser.add_argument("--check-rollups", action="store_true", help="сверить сводные таблицы продаж с заказами")
+    return parser
+
+
+def run_command(args: argparse.Namespace) -> int | None:
+    if args.db:
+        open_database(args.db)
+    if args.trace:
+        tracer.enable(args.slow_ms)
+    if args.check_plans:
+        return 0 if print_query_plans() else 1
+    setup_database()
+    if args.seed:
+        seed_database()
+        print("Начальные данные добавлены")
+        connections.close()
+        return 0
+    if args.rebuild_rollups:
+        started = time.perf_counter()
+        with connections.write() as con:
+            rebuild_rollups(con)
+        print(f"Сводные таблицы пересчитаны за {time.perf_counter() - started:.2f} с")
+        connections.close()
+        return 0
+    if args.check_rollups:
+        report = check_rollups(connections.read())
+        print("\n".join(report) if report else "Сводные таблицы совпадают с заказами")
+        connections.close()
+        return 1 if report else 0
+    if args.import_path:
+        ok = print_import(args.import_path, args.batch_size, args.rejects)
+        if tracer.enabled:
+            tracer.print_report()
+        connections.close()
+        return 0 if ok else 1
+    if args.export:
+        print_export(args.export, args.out or f"{args.export}.csv")
+        if tracer.enabled:
+            tracer.print_report()
+        connections.close()
+        return 0
+    return None
+
+
+if __name__ == "__main__":
+    raise SystemExit(run_command(command_parser().parse_args()) or 0)
@@ -0,0 +1,30 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import store
+
+
+class SeedTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        store.open_database(Path(self.tmp.name) / "test.db")
+
+    def tearDown(self):
+        store.open_database(store.DB_FILE)
+        self.tmp.cleanup()
+
+    def test_seed_migrated_database(self):
+        store.setup_database()
+        self.assertEqual(store.refs.ids("vendor"), {})
+        self.assertEqual(store.item_search.find("UG"), [])
+        store.seed_database()
+        self.assertEqual(len(store.refs.ids("vendor")), 3)
+        self.assertEqual(len(store.item_search.find("UG")), 10)
+        snapshot = store.CatalogSnapshot.load()
+        self.assertEqual(len(snapshot.index), 10)
+        self.assertEqual(snapshot.columns["vendor_title"][0], store.refs.titles("vendor")[snapshot.columns["vendor_id"][0]])
+
+
+if __name__ == "__main__":
+    unittest.main()